@@ -0,0 +1,86 @@
+"""
+Benchmarks `Blocks` iteration over a pipe (i.e. what a stdin-fed
+``slurp source X consume -`` does) for growing inputs. Per-byte cost should
+stay flat as input size grows:
+
+.. code:: bash
+
+    $ python bench/blocks.py --sizes 8 16 32 64 --read-size 1048576
+
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import slurp
+
+
+LINE = (
+    '127.0.0.1 - - [20/Feb/2014:11:37:58] "POST /credits/CR3sPVGSAkPYA9vp1lsh'
+    'EMv4/reversals HTTP/1.1" 201 740 "-" "balanced-python/1.0.1beta2" '
+    'request_time_seconds=0 request_time_microseconds=622211\n'
+)
+
+
+def generate(size):
+    fd, path = tempfile.mkstemp(prefix='slurp-bench-')
+    with os.fdopen(fd, 'w') as fo:
+        chunk = LINE * (1024 * 1024 // len(LINE))
+        written = 0
+        while written < size:
+            fo.write(chunk)
+            written += len(chunk)
+    return path
+
+
+def run(path, prefix, read_size, buffer_size):
+    proc = subprocess.Popen(['cat', path], stdout=subprocess.PIPE)
+    try:
+        blocks = slurp.Blocks(
+            proc.stdout,
+            prefix=prefix,
+            terminal='\n',
+            read_size=read_size,
+            max_buffer_size=buffer_size,
+        )
+        st = time.time()
+        count = 0
+        for _ in blocks:
+            count += 1
+        et = time.time()
+    finally:
+        proc.wait()
+    return count, et - st
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 8, 16, 32], metavar='MB')
+    parser.add_argument('--read-size', type=int, default=1024 * 1024)
+    parser.add_argument('--buffer-size', type=int, default=4 * 1024 * 1024)
+    parser.add_argument('--prefix', default=None)
+    args = parser.parse_args()
+
+    costs = []
+    for size in args.sizes:
+        path = generate(size * 1024 * 1024)
+        try:
+            bytes = os.stat(path).st_size
+            count, delta = run(path, args.prefix, args.read_size, args.buffer_size)
+        finally:
+            os.remove(path)
+        cost = delta / bytes * 1e9
+        costs.append(cost)
+        print '{0:>6} MB {1:>10} blocks {2:>8.3f} sec(s) {3:>8.2f} ns/byte'.format(
+            size, count, delta, cost
+        )
+    print 'ns/byte ratio (largest / smallest input) {0:.2f}'.format(costs[-1] / costs[0])
+
+
+if __name__ == '__main__':
+    main()
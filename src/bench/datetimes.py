@@ -0,0 +1,62 @@
+"""
+Benchmarks `form.Datetime` parsing of access log timestamps against
+``arrow.get`` for a run of consecutive seconds with several lines per second
+(i.e. what a busy access log looks like):
+
+.. code:: bash
+
+    $ python bench/datetimes.py --count 100000 --per-second 10
+
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import arrow
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import slurp
+
+
+FORMAT = 'DD/MMM/YYYY:HH:mm:ss'
+
+
+def generate(count, per_second):
+    start = datetime.datetime(2014, 2, 20, 11, 37, 58)
+    return [
+        (start + datetime.timedelta(seconds=i // per_second)).strftime('%d/%b/%Y:%H:%M:%S')
+        for i in xrange(count)
+    ]
+
+
+def run(parse, values):
+    st = time.time()
+    for value in values:
+        parse(value)
+    return time.time() - st
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--per-second', type=int, default=10)
+    parser.add_argument('--format', default=FORMAT)
+    args = parser.parse_args()
+
+    values = generate(args.count, args.per_second)
+    field = slurp.form.Datetime(format=args.format)
+    for name, parse in [
+            ('arrow', lambda value: arrow.get(value, args.format).datetime),
+            ('Datetime', field.convert),
+        ]:
+        delta = run(parse, values)
+        print '{0:>10} {1:>10} values {2:>8.3f} sec(s) {3:>8.2f} us/value'.format(
+            name, len(values), delta, delta / len(values) * 1e6
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmarks serializing access log forms with `serialize.Encoder`, for each
+available JSON backend, against ``json.dumps`` with a ``default`` for datetimes
+and ``pprint.pformat`` (i.e. what `Echo` used to do):
+
+.. code:: bash
+
+    $ python bench/serialize.py --count 100000 --per-second 10
+
+"""
+import argparse
+import datetime
+import json
+import os
+import pprint
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import slurp
+
+
+class Form(slurp.Form):
+
+    ip = slurp.form.String()
+    user = slurp.form.String(default=None)
+    timestamp = slurp.form.Datetime(format='DD/MMM/YYYY:HH:mm:ss')
+    method = slurp.form.String(default=None)
+    uri = slurp.form.String(default=None)
+    version = slurp.form.String(default=None)
+    status = slurp.form.Integer(default=None)
+    bytes = slurp.form.Integer(default=0)
+    request_time = slurp.form.Float(default=None)
+
+
+def generate(count, per_second):
+    start = datetime.datetime(2014, 2, 20, 11, 37, 58)
+    mapper = slurp.form.compile(Form)
+    forms = []
+    for i in xrange(count):
+        form, _ = mapper({
+            'ip': '127.0.0.1',
+            'timestamp': (
+                start + datetime.timedelta(seconds=i // per_second)
+            ).strftime('%d/%b/%Y:%H:%M:%S'),
+            'method': 'POST',
+            'uri': '/credits/CR3sPVGSAkPYA9vp1lshEMv4/reversals',
+            'version': '1.1',
+            'status': '201',
+            'bytes': str(740 + i % 100),
+            'request_time': '0.622211',
+        })
+        forms.append(form)
+    return forms
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError('{0!r} is not JSON serializable'.format(value))
+
+
+def run(dumps, forms):
+    st = time.time()
+    for form in forms:
+        dumps(form)
+    return time.time() - st
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--per-second', type=int, default=10)
+    args = parser.parse_args()
+
+    forms = generate(args.count, args.per_second)
+    candidates = [
+        ('pprint', pprint.pformat),
+        ('json', lambda form: json.dumps(form, separators=(',', ':'), default=_default)),
+    ]
+    for name, factory in slurp.serialize.BACKENDS:
+        try:
+            factory()
+        except ImportError:
+            print '{0:>20} not installed'.format('Encoder/' + name)
+            continue
+        candidates.append(('Encoder/' + name, slurp.serialize.Encoder(name)))
+    for name, dumps in candidates:
+        delta = run(dumps, forms)
+        print '{0:>20} {1:>10} forms {2:>8.3f} sec(s) {3:>8.2f} us/form'.format(
+            name, len(forms), delta, delta / len(forms) * 1e6
+        )
+
+
+if __name__ == '__main__':
+    main()
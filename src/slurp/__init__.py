@@ -7,13 +7,16 @@ try:
 except ImportError:
     pyinotify = None
 
-from . import settings, form
-from .block import Block, Blocks, seekable
+from . import settings, form, compress, serialize
+from .block import Block, BlockBatch, Blocks, seekable
+from .index import BlockIndex
 from .settings import Settings
 from .form import Form
 from .sink import Sink, SinkSettings, Echo, Drop, Tally
 from .source import Source, SourceSettings
-from .channel import Channel, ChannelSource, ChannelSettings, ChannelEvent
+from .channel import (
+    Channel, ChannelSource, ChannelSettings, ChannelEvent, SharedSource, share,
+)
 from .config import Config
 
 __version__ = '0.6.6'
@@ -21,10 +24,14 @@ __version__ = '0.6.6'
 __all__ = [
     'settings',
     'Settings',
+    'compress',
+    'serialize',
     'form',
     'Form',
     'Block',
+    'BlockBatch',
     'Blocks',
+    'BlockIndex',
     'Sink',
     'SinkSettings',
     'Echo',
@@ -36,6 +43,8 @@ __all__ = [
     'ChannelEvent',
     'ChannelSource',
     'ChannelSettings',
+    'SharedSource',
+    'share',
     'Config',
     'touch',
     'tell',
@@ -84,7 +93,7 @@ def reset(file_paths, channels):
             yield channel.name, source.name, path
 
 
-def consume(file_paths, channels, reset=False):
+def consume(file_paths, channels, reset=False, jobs=None, since=None, until=None):
     """
     Consumes blocks from files.
 
@@ -107,6 +116,17 @@ def consume(file_paths, channels, reset=False):
     :param reset:
         Flag indicating whether existing offset information should be reset
         when consuming blocks.
+
+    :param jobs:
+        Number of processes used to parse each file. If > 1 files must be
+        regular files.
+
+    :param since:
+        Timestamp (`datetime` or seconds since the epoch) of the first block to
+        consume from each file. Sources must have a timestamp field.
+
+    :param until:
+        Timestamp at which to stop consuming each file.
     """
     for channel in channels:
         matches = []
@@ -139,7 +159,7 @@ def consume(file_paths, channels, reset=False):
                     source.reset(path)
 
                 # eat it
-                consume(path, source)
+                consume(path, source, jobs, since, until)
                 path_name = path if isinstance(path, basestring) else getattr(path, 'name', '<memory>')
                 matches.append((source.name, path_name))
         yield channel.name, matches, consume.count, consume.bytes, consume.errors
@@ -149,8 +169,9 @@ if pyinotify:
 
     class WatchEvent(pyinotify.ProcessEvent):
 
-        def __init__(self, channels):
+        def __init__(self, channels, shared=True):
             super(WatchEvent, self).__init__()
+            self.shared = share(channels) if shared else []
             self.workers = [channel.worker() for channel in channels]
             for worker in self.workers:
                 worker.daemon = True
@@ -210,10 +231,12 @@ if pyinotify:
                     self.on_modify_file(path)
 
 
-def watch(paths, channels, timeout=None, stop=None, recursive=True, auto_add=True):
+def watch(paths, channels, timeout=None, stop=None, recursive=True, auto_add=True, shared=True):
     """
     Monitors paths (files or directories) for changes to files and consumes
-    blocks from them when changes are detected.
+    blocks from them when changes are detected. If `shared` then files of
+    sources common to several channels are parsed once for all of them (see
+    `share`).
     """
     if not pyinotify:
         raise RuntimeError('Cannot import pyinotify, pip install pyinotify!')
@@ -228,7 +251,7 @@ def watch(paths, channels, timeout=None, stop=None, recursive=True, auto_add=Tru
         pyinotify.IN_MOVE_SELF
     )
     wm = pyinotify.WatchManager()
-    we = WatchEvent(channels)
+    we = WatchEvent(channels, shared)
     notifier = pyinotify.Notifier(wm, default_proc_fun=we, timeout=timeout)
     notifier.coalesce_events(True)
     for path in paths:
@@ -52,10 +52,25 @@ or:
     for block in blocks:
         pprint(block)
 
+or, to amortize per-block overhead, in bulk as `BlockBatch`es:
+
+.. code::
+
+    for batch in blocks.batches(max_blocks=256):
+        for block in batch:
+            pprint(block)
+
+If the file-like object is a regular file (i.e. not a pipe, terminal or
+in-memory buffer) it is memory mapped and blocks are scanned in-place. Only
+the bytes of yielded blocks, or batches of blocks, are copied out of the
+mapping so `raw` is always a `str`.
+
 """
+import array
 import collections
 import functools
 import logging
+import mmap
 import os
 import re
 import stat
@@ -63,12 +78,78 @@ import stat
 
 logger = logging.getLogger(__name__)
 
+#: `array` type code for file offsets. Python 2 has no "q" so use its C long,
+#: which is 64 bits on LP64 platforms.
+OFFSET_TYPE = 'q' if 'q' in getattr(array, 'typecodes', '') else 'l'
+
 #: A named tuple representing a block.
 Block = collections.namedtuple(
     'Block',
     ['path', 'begin', 'end', 'raw'],
 )
 
+
+class BlockBatch(object):
+    """
+    A run of blocks sharing one contiguous buffer. Block offsets are kept in
+    arrays so no `Block` is created unless it is asked for.
+    """
+
+    __slots__ = ('path', 'buf', 'base', 'begins', 'ends')
+
+    def __init__(self, path, buf, base, begins, ends):
+        """
+        :param path:
+            Path of the file the blocks are from.
+
+        :param buf:
+            Buffer holding the blocks.
+
+        :param base:
+            File offset of `buf[0]`.
+
+        :param begins:
+            `array` of block begin file offsets.
+
+        :param ends:
+            `array` of block end file offsets.
+        """
+        self.path = path
+        self.buf = buf
+        self.base = base
+        self.begins = begins
+        self.ends = ends
+
+    def __len__(self):
+        return len(self.begins)
+
+    def __iter__(self):
+        for i in xrange(len(self.begins)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        return Block(
+            path=self.path, begin=self.begins[i], end=self.ends[i], raw=self.raw(i),
+        )
+
+    def span(self, i):
+        """
+        The (start, stop) of a block within `buf`.
+        """
+        return self.begins[i] - self.base, self.ends[i] - self.base
+
+    def raw(self, i):
+        start, stop = self.span(i)
+        return self.buf[start:stop]
+
+    @property
+    def begin(self):
+        return self.begins[0]
+
+    @property
+    def end(self):
+        return self.ends[-1]
+
 class Blocks(object):
     """
     Collection of "blocks" backed by a file-like object.
@@ -80,7 +161,8 @@ class Blocks(object):
             prefix=None,
             terminal='\n',
             read_size=2048,
-            max_buffer_size=1048576
+            max_buffer_size=1048576,
+            mmap=True,
         ):
         """
         :param fo:
@@ -96,28 +178,120 @@ class Blocks(object):
         :param max_buffer_size:
             The maximum number of bytes to buffer at a time or None for maximum.
             Defaults to None.
+
+        :param mmap:
+            Flag indicating whether regular files should be memory mapped
+            rather than read. Defaults to True.
         """
         self.fo = fo
         self.read_size = read_size
         self.max_buffer_size = max_buffer_size
         self.strict = strict
+        self.mmap = mmap
+        self.terminal = terminal
         if prefix is not None:
+            if isinstance(prefix, basestring):
+                prefix = re.compile(prefix)
+            self.boundary = boundary(prefix, terminal)
             self.iter_cls = functools.partial(
                 MultiLineIterator, preamble=prefix, terminal=terminal
             )
+            self.mmap_iter_cls = functools.partial(
+                MmapMultiLineIterator, preamble=prefix, terminal=terminal
+            )
         else:
+            self.boundary = None
             self.iter_cls = functools.partial(
                 LineIterator, terminal=terminal
             )
+            self.mmap_iter_cls = functools.partial(
+                MmapLineIterator, terminal=terminal
+            )
 
     def __iter__(self):
-        return self.iter_cls(
+        iter_cls = self.iter_cls
+        if self.mmap and mappable(self.fo):
+            iter_cls = self.mmap_iter_cls
+        return iter_cls(
             self.fo,
             strict=self.strict,
             read_size=self.read_size,
             max_buffer_size=self.max_buffer_size
         )
 
+    def batches(self, max_blocks=1024, max_bytes=None):
+        """
+        Generator for `BlockBatch`es of up to `max_blocks` blocks spanning up
+        to `max_bytes` bytes. A batch only holds blocks that are complete in
+        what has been read so far, so it can be smaller.
+        """
+        blocks = iter(self)
+        while True:
+            batch = blocks.batch(max_blocks, max_bytes)
+            if batch is None:
+                break
+            yield batch
+
+    def align(self, offset):
+        """
+        Finds the offset of the first block that begins at or after `offset`.
+        The file-like object must be seekable but its position is not changed.
+        """
+        if offset <= 0:
+            return 0
+        start = offset - len(self.terminal)
+        if not mappable(self.fo):
+            position = self.fo.tell()
+            try:
+                return self._align_read(start)
+            finally:
+                self.fo.seek(position, os.SEEK_SET)
+        size = os.fstat(self.fo.fileno()).st_size
+        if offset >= size:
+            return size
+        buf = mmap.mmap(self.fo.fileno(), size, access=mmap.ACCESS_READ)
+        if self.boundary is not None:
+            match = self.boundary.search(buf, start)
+            index = match.start() if match else -1
+        else:
+            index = buf.find(self.terminal, start)
+        if index == -1:
+            return size
+        return index + len(self.terminal)
+
+    def _align_read(self, start):
+        """
+        Reads forward from `start` in `read_size` chunks until the first
+        terminal, or boundary, so only the bytes up to it are read (e.g.
+        decompressed) and buffered.
+        """
+        self.fo.seek(start, os.SEEK_SET)
+        base, buf, resume = start, '', 0
+        while True:
+            chunk = self.fo.read(self.read_size)
+            if not chunk:
+                break
+            buf += chunk
+            if self.boundary is not None:
+                match = self.boundary.search(buf, resume)
+                if match:
+                    return base + match.start() + len(self.terminal)
+                # NOTE: the last terminal's preamble may not be completely read
+                index = buf.rfind(self.terminal, resume)
+                if index != -1:
+                    resume = index
+                else:
+                    resume = max(resume, len(buf) - len(self.terminal) + 1)
+            else:
+                index = buf.find(self.terminal, resume)
+                if index != -1:
+                    return base + index + len(self.terminal)
+                resume = max(resume, len(buf) - len(self.terminal) + 1)
+            base, buf, resume = base + resume, buf[resume:], 0
+        # NOTE: start may have been past the end, seeking it is cheap once read
+        self.fo.seek(0, os.SEEK_END)
+        return min(base + len(buf), self.fo.tell())
+
     def tell(self):
         return self.fo.tell()
 
@@ -141,11 +315,33 @@ def is_piped(fo):
     return stat.S_ISFIFO(mode)
 
 
+def boundary(preamble, terminal):
+    """
+    Compiles a regex matching a terminal followed by a preamble, i.e. where one
+    multi-line block ends and the next begins.
+    """
+    return re.compile(
+        '(?:{0})(?:{1})'.format(re.escape(terminal), preamble.pattern),
+        preamble.flags,
+    )
+
+
+def mappable(fo):
+    if not hasattr(fo, 'fileno'):
+        return False
+    mode = os.fstat(fo.fileno()).st_mode
+    return stat.S_ISREG(mode)
+
+
 class BlockIterator(object):
     """
     Base class for "block" parsers. A "block" within a file is just a delimited
     string. For log files these "blocks" are typically called entries. Derived
     classes need to determine how "blocks" are delimited.
+
+    Reads are appended to `buf` and `cursor` is the index in `buf` of the first
+    unconsumed byte. Consumed bytes are only compacted away once they make up
+    more than half of `buf`, so each byte is moved a bounded number of times.
     """
 
     def __init__(self, fo, strict=False, read_size=2048, max_buffer_size=1048576):
@@ -156,59 +352,149 @@ class BlockIterator(object):
         self.read_size = read_size
         self.max_buffer_size = max_buffer_size
         self.buf = bytearray()
+        self.cursor = 0
         self.eof = False
         self.discard = False
 
+    @property
+    def base(self):
+        """
+        File offset of `buf[0]`.
+        """
+        return self.pos - self.cursor
+
     def __iter__(self):
         return self
 
     def next(self):
-        if self.buf:
-            result = self._parse(self.eof)
-            if result:
-                raw, offset_b, offset_e = result
-                return Block(
-                    path=self.path, begin=offset_b, end=offset_e, raw=raw
-                )
-        while not self.eof:
-            if self.max_buffer_size is None:
-                buf = self.fo.read(self.read_size)
-                self.eof = (len(buf) != self.read_size)
-            else:
-                read_size = min(self.read_size, self.max_buffer_size - len(self.buf))
-                buf = self.fo.read(read_size)
-                self.eof = (len(buf) != read_size)
-            self.buf.extend(buf)
-            result = self._parse(self.eof)
-            if not result:
-                if self.max_buffer_size is not None and len(self.buf) >= self.max_buffer_size:
-                    if self.strict:
-                        raise ValueError(
-                            '{0}[{1}:{2}] partial block exceeds buffer size {3}'.format(
-                            self.path,
-                            self.pos, self.pos + len(self.buf),
-                            self.max_buffer_size
-                        ))
-                    logger.warning(
-                        '%s[%s:%s] partial block exceeds buffer size %s, discarding',
-                        self.path,
-                        self.pos, self.pos + len(self.buf),
-                        self.max_buffer_size
+        while True:
+            if self.cursor < len(self.buf):
+                index = self._scan(self.eof)
+                if index is not None:
+                    start = self._consume(index)
+                    if start is None:
+                        continue
+                    return Block(
+                        path=self.path,
+                        begin=self.base + start,
+                        end=self.pos,
+                        raw=self._raw(start, index),
                     )
-                    self.discard = True
-                    del self.buf[:]
-                continue
-            raw, offset_b, offset_e = result
-            if self.discard:
-                logger.info('%s[%s:%s] partial block, discarding', self.path, offset_b, offset_e)
-                self.discard = False
-                continue
-            return Block(
-                path=self.path, begin=offset_b, end=offset_e, raw=raw
-            )
+            if self.eof:
+                break
+            self._fill()
+        self._exhausted()
         raise StopIteration()
 
-    def _parse(self, eof):
+    def batch(self, max_blocks=None, max_bytes=None):
+        """
+        Scans all complete blocks currently buffered, reading more only if
+        there are none, and returns them as a `BlockBatch` or None if there
+        are no more blocks.
+        """
+        begins, ends = array.array(OFFSET_TYPE), array.array(OFFSET_TYPE)
+        first = last = None
+        while True:
+            if self.cursor < len(self.buf):
+                index = self._scan(self.eof)
+                if index is not None:
+                    if (max_bytes is not None and first is not None and
+                        index - first > max_bytes):
+                        break
+                    start = self._consume(index)
+                    if start is None:
+                        continue
+                    if first is None:
+                        first = start
+                    last = index
+                    begins.append(self.base + start)
+                    ends.append(self.pos)
+                    if max_blocks is not None and len(begins) >= max_blocks:
+                        break
+                    continue
+            # NOTE: filling may compact buf and invalidate scanned indices
+            if begins or self.eof:
+                break
+            self._fill()
+        if not begins:
+            self._exhausted()
+            return None
+        return BlockBatch(
+            path=self.path,
+            buf=self._raw(first, last),
+            base=begins[0],
+            begins=begins,
+            ends=ends,
+        )
+
+    def _consume(self, index):
+        """
+        Consumes `buf` up to `index`.
+
+        :return:
+            Index in `buf` of the start of the consumed block or None if it
+            was discarded.
+        """
+        begin, end = self.pos, self.pos + (index - self.cursor)
+        start, self.cursor, self.pos = self.cursor, index, end
+        if self.discard:
+            logger.info('%s[%s:%s] partial block, discarding', self.path, begin, end)
+            self.discard = False
+            return None
+        return start
+
+    def _exhausted(self):
+        pass
+
+    def _raw(self, start, stop):
+        return str(buffer(self.buf, start, stop - start))
+
+    def _compact(self):
+        if self.cursor and self.cursor * 2 >= len(self.buf):
+            del self.buf[:self.cursor]
+            self.cursor = 0
+
+    def _fill(self):
+        self._compact()
+        unconsumed = len(self.buf) - self.cursor
+        if self.max_buffer_size is None:
+            read_size = self.read_size
+        else:
+            if unconsumed >= self.max_buffer_size:
+                self._overflow()
+                unconsumed = 0
+            read_size = min(self.read_size, self.max_buffer_size - unconsumed)
+        buf = self.fo.read(read_size)
+        self.eof = (len(buf) != read_size)
+        self.buf.extend(buf)
+
+    def _overflow(self):
+        if self.strict:
+            raise ValueError(
+                '{0}[{1}:{2}] partial block exceeds buffer size {3}'.format(
+                self.path,
+                self.pos, self.base + len(self.buf),
+                self.max_buffer_size
+            ))
+        logger.warning(
+            '%s[%s:%s] partial block exceeds buffer size %s, discarding',
+            self.path,
+            self.pos, self.base + len(self.buf),
+            self.max_buffer_size
+        )
+        self.discard = True
+        self.pos = self.base + len(self.buf)
+        del self.buf[:]
+        self.cursor = 0
+
+    def _scan(self, eof):
+        """
+        Scans `buf` from `cursor` for the end of the next complete block.
+
+        :return:
+            Index in `buf` one past the end of the block or None if `buf` does
+            not (yet) contain a complete block.
+        """
         raise NotImplementedError()
 
 
@@ -226,16 +512,16 @@ class LineIterator(BlockIterator):
         """
         super(LineIterator, self).__init__(fo, **kwargs)
         self.terminal = terminal
+        self.scanned = self.pos
 
-    def _parse(self, eof):
-        index = self.buf.find(self.terminal)
+    def _scan(self, eof):
+        # NOTE: resume from where the last miss left off
+        start = max(self.cursor, self.scanned - self.base - len(self.terminal) + 1)
+        index = self.buf.find(self.terminal, start)
         if index == -1:
+            self.scanned = self.base + len(self.buf)
             return None
-        index += len(self.terminal)
-        result = self.buf[:index], self.pos, self.pos + index
-        self.buf = self.buf[index:]
-        self.pos += index
-        return result
+        return index + len(self.terminal)
 
 
 class MultiLineIterator(BlockIterator):
@@ -243,8 +529,16 @@ class MultiLineIterator(BlockIterator):
     A block parser where all "blocks" are delimited by a preamble (i.e. prefix)
     regex and a terminal string. Multi-line error logs are a good example of a
     multi-line oriented block parser.
+
+    Block boundaries (i.e. a terminal immediately followed by a preamble) are
+    found with a single `finditer` pass over newly read data. The scan resumes
+    from where the previous one left off so no byte is rescanned other than a
+    trailing line that may hold a boundary cut short by a read.
     """
 
+    #: Maximum number of boundaries to buffer per scan.
+    scan_limit = 1024
+
     def __init__(self, fo, preamble, terminal, **kwargs):
         """
         :param preamble:
@@ -258,53 +552,127 @@ class MultiLineIterator(BlockIterator):
             preamble = re.compile(preamble)
         self.preamble = preamble
         self.terminal = terminal
-
-    def _parse(self, eof):
-        match = self.preamble.search(self.buf)
-        if not match:
-            logger.debug('%s[%s:%s] has no preamble', self.path,
-                self.pos, self.pos + len(self.buf))
+        self.boundary = boundary(preamble, terminal)
+        self.aligned = False
+        self.scanned = self.pos
+        self.ends = collections.deque()
+
+    def _align(self):
+        if self.aligned:
+            return True
+        if self.preamble.match(self.buf, self.cursor):
+            logger.debug('%s[%s:] has preamble', self.path, self.pos)
+            self.aligned = True
+            return True
+        match = self.boundary.search(self.buf, self.cursor)
+        if match:
+            index = match.start() + len(self.terminal)
+            self.aligned = True
+        else:
+            # NOTE: nothing before the last terminal can start a block
+            index = self.buf.rfind(self.terminal, self.cursor)
+            if index == -1:
+                logger.debug('%s[%s:%s] has no preamble', self.path,
+                    self.pos, self.base + len(self.buf))
+                return False
+            index += len(self.terminal)
+        if self.strict:
+            raise ValueError('{0}[{1}:{2}] is partial block'.format(
+                self.path, self.pos, self.base + index))
+        logger.warning('%s[%s:%s] is partial block, discarding',
+            self.path, self.pos, self.base + index)
+        self.pos = self.base + index
+        self.cursor = index
+        return self.aligned
+
+    def _boundaries(self):
+        start = max(self.cursor, self.scanned - self.base)
+        last = None
+        for match in self.boundary.finditer(self.buf, start):
+            last = match.start()
+            self.ends.append(self.base + last + len(self.terminal))
+            if len(self.ends) >= self.scan_limit:
+                self.scanned = self.base + last + 1
+                break
+        else:
+            # NOTE: resume from the last terminal not known to start a
+            # boundary, its preamble may not have been completely read
+            resume = len(self.buf) - len(self.terminal) + 1
+            index = self.buf.rfind(self.terminal, start)
+            if index != -1 and index != last:
+                resume = index
+            self.scanned = self.base + max(start, resume)
+        logger.debug('%s[%s:%s] has %s boundaries', self.path,
+            self.base + start, self.base + len(self.buf), len(self.ends))
+
+    def _scan(self, eof):
+        if not self._align():
+            return None
+        while self.ends and self.ends[0] <= self.pos:
+            self.ends.popleft()
+        if not self.ends:
+            self._boundaries()
+        if self.ends:
+            logger.debug('%s[%s:%s] hit', self.path, self.pos, self.ends[0])
+            return self.ends[0] - self.base
+        if not eof:
+            return None
+        if self.buf[-len(self.terminal):] != self.terminal:
             return None
-        if match.start() != 0:
+        logger.debug('%s[%s:] hit', self.path, self.pos)
+        return len(self.buf)
+
+
+class MmapIterator(object):
+    """
+    Mixin for "block" parsers that scan a memory mapped regular file in-place
+    rather than reading it into a buffer. Here `buf` is the mapping of the
+    whole file, so `cursor` is always `pos`. The mapping is re-created if the
+    file grows while iterating.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(MmapIterator, self).__init__(*args, **kwargs)
+        self.cursor = self.pos
+
+    def _exhausted(self):
+        self.fo.seek(self.pos, os.SEEK_SET)
+
+    def _consume(self, index):
+        if self.max_buffer_size is not None and index - self.cursor > self.max_buffer_size:
             if self.strict:
-                raise ValueError('%s[%s:%s] is partial block',
-                    self.path, self.pos, self.pos + match.start())
-            logger.warning('%s[%s:%s] is partial block, discarding',
-                self.path, self.pos, self.pos + match.start())
-            self.buf = self.buf[match.start():]
-            self.pos += match.start()
-        logger.debug('%s[%s:] has preamble', self.path, self.pos)
-        next = match
-        while True:
-            prev = next
-            next = self.preamble.search(self.buf, prev.end())
-            if not next:
-                logger.debug('%s[%s:] contains no preamble',
-                    self.path, self.pos + prev.end())
-                break
-            prefix = self.buf[
-                next.start() - len(self.terminal):next.start()]
-            if prefix == self.terminal:
-                logger.debug('%s[%s:] contains terminal-prefixed preamble',
-                    self.path, self.pos + next.end())
-                break
-            logger.debug('%s[%s:] contains non-terminal-prefixed preamble',
-                self.path, self.pos + next.end())
+                raise ValueError(
+                    '{0}[{1}:{2}] block exceeds buffer size {3}'.format(
+                    self.path, self.pos, index, self.max_buffer_size
+                ))
+            logger.warning(
+                '%s[%s:%s] block exceeds buffer size %s, discarding',
+                self.path, self.pos, index, self.max_buffer_size
+            )
+            self.cursor = self.pos = index
             return None
-        if next:
-            logger.debug('%s[%s:%s] hit', self.path, self.pos,
-                self.pos + next.start())
-            raw = str(self.buf[:next.start()])
-            self.buf = self.buf[next.start():]
-        else:
-            if not eof:
-                return None
-            suffix = self.buf[-len(self.terminal):]
-            if suffix != self.terminal:
-                return None
-            logger.debug('%s[%s:] hit', self.path, self.pos)
-            raw = str(self.buf)
-            del self.buf[:]
-        result = raw, self.pos, self.pos + len(raw)
-        self.pos += len(raw)
-        return result
+        return super(MmapIterator, self)._consume(index)
+
+    def _fill(self):
+        size = os.fstat(self.fo.fileno()).st_size
+        if size <= len(self.buf) or size <= self.pos:
+            self.eof = True
+            return
+        # NOTE: yielded raws are copies so the previous mapping can be closed
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        self.buf = mmap.mmap(self.fo.fileno(), size, access=mmap.ACCESS_READ)
+        self.eof = False
+
+
+class MmapLineIterator(MmapIterator, LineIterator):
+    """
+    A `LineIterator` that scans terminals in a memory mapped file.
+    """
+
+
+class MmapMultiLineIterator(MmapIterator, MultiLineIterator):
+    """
+    A `MultiLineIterator` that scans terminal-prefixed preambles in a memory
+    mapped file.
+    """
@@ -9,12 +9,15 @@ A `Channel` is what:
 import collections
 import contextlib
 import errno
+import functools
 import json
 import logging
 import os
 import Queue
 import sqlite3
+import struct
 import subprocess
+import sys
 import tempfile
 import time
 import threading
@@ -24,7 +27,9 @@ try:
 except ImportError:
     pass
 
-from . import settings, Settings, Source, form, Form, seekable
+from . import settings, Settings, Source, Sink, form, Form, seekable, compress
+from .block import mappable
+from .source import parse_pool
 
 
 logger = logging.getLogger(__name__)
@@ -46,6 +51,12 @@ class ChannelSettings(Settings):
     #: discarded.
     filter = settings.Code(default=None).as_callable(lambda form, block: None)
 
+    #: Names of the source pattern groups `filter` reads. If set `filter` is
+    #: called with a read-only mapping of just those groups' raw string values
+    #: as its "form" *before* the block is mapped by the source and channel
+    #: forms.
+    filter_fields = settings.List(settings.String(), default=None)
+
     #: Flag indicating whether channel processing errors should be ignored or
     #: blocking.
     strict = settings.Boolean(default=False)
@@ -61,6 +72,18 @@ class ChannelSettings(Settings):
     #: should be persisted.
     track = settings.Boolean(default=None)
 
+    #: Maximum number of seconds offsets are buffered in memory for before
+    #: being committed while consuming. They are otherwise committed when the
+    #: sink is flushed, every `batch_size` blocks emitted by a sink that does
+    #: not buffer and when consumption of a file stops. So at most a batch,
+    #: or `track_interval` seconds, of blocks is replayed after a crash (or a
+    #: whole file if the channel has no `batch_size`). 0 means none.
+    track_interval = settings.Float(default=None).min(0)
+
+    #: How offsets are persisted, either "sqlite" for a `Tracker` or "log"
+    #: for a `LogTracker`.
+    tracker = settings.String(default='sqlite', choices=['sqlite', 'log'])
+
     #: Flag indicating whether newly tracked source files should be processed
     #: from the beginning of end upon detection.
     backfill = settings.Boolean(default=None)
@@ -92,6 +115,30 @@ class ChannelSettings(Settings):
     #: Maximum number of block to process before forcing a sink flush.
     batch_size = settings.Integer(default=None)
 
+    #: Flag indicating whether the number of blocks processed before forcing a
+    #: sink flush should adapt, starting at `batch_size`, to the sink. It is
+    #: adapted whenever a batch limit (size, bytes or latency) forces a flush:
+    #: increased by a tenth of `batch_size` if flushing was no slower per block
+    #: than the moving average, halved if it was much slower or failed and
+    #: otherwise left as is. Without a `batch_size` it starts at
+    #: `batch_size_max`.
+    batch_adaptive = settings.Boolean(default=False)
+
+    #: Minimum adaptive batch size. Defaults to 1.
+    batch_size_min = settings.Integer(default=None).min(1)
+
+    #: Maximum adaptive batch size. Defaults to 10 times `batch_size`.
+    batch_size_max = settings.Integer(default=None).min(1)
+
+    #: Maximum number of block bytes to process before forcing a sink flush.
+    #: Sinks are also told this (see `Sink.limits`) so they can size requests
+    #: by payload bytes.
+    batch_bytes = settings.Integer(default=None).min(1)
+
+    #: Maximum number of seconds a block can be pending for before forcing a
+    #: sink flush, including while a channel worker waits for more blocks.
+    batch_latency = settings.Float(default=None).min(0)
+
     #: Initial number of seconds to throttle the channel on error.
     throttle_duration = settings.Integer(default=30)
 
@@ -111,6 +158,16 @@ class ChannelSettings(Settings):
     #: Channel flush frequency in seconds. 0 means none.
     flush_frequency = settings.Float(default=None).min(0)
 
+    #: Maximum number of parsed batches of blocks to read ahead, in a separate
+    #: thread, while the sink processes and flushes earlier ones. 0 means
+    #: blocks are read, parsed and sunk serially.
+    pipeline = settings.Integer(default=0).min(0)
+
+    #: Number of processes blocks are mapped to forms by. Blocks are still
+    #: read by the channel but matching, mapping and filtering them is done in
+    #: parallel by this many processes. 0 means none.
+    parse_workers = settings.Integer(default=0).min(0)
+
     #: `Sink` name.
     sink = settings.String()
 
@@ -153,23 +210,64 @@ class Channel(object):
             queue_poll=10.0,
             stats=False,
             flush_frequency=None,
+            filter_fields=None,
+            pipeline=0,
+            parse_workers=0,
+            track_interval=None,
+            read_only=False,
+            tracker='sqlite',
+            batch_bytes=None,
+            batch_latency=None,
+            batch_adaptive=False,
+            batch_size_min=None,
+            batch_size_max=None,
         ):
         self.name = name
         self.state_dir = state_dir
         self.sources = sources or []
+        if batch_adaptive and batch_size is None:
+            if batch_size_max is None:
+                raise ValueError(
+                    'Channel {0} batch_adaptive requires batch_size or batch_size_max'
+                    .format(name)
+                )
+            batch_size = batch_size_max
         self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.batch_latency = batch_latency
+        self.batch_adaptive = batch_adaptive
+        self.batch_size_min = batch_size_min or 1
+        self.batch_size_max = batch_size_max or 10 * (batch_size or 1)
         self.filter = filter
+        self.filter_fields = filter_fields
         self.form = form
         if track:
-            track_path = os.path.join(self.state_dir, self.name + '.track')
+            track_path = os.path.join(
+                self.state_dir,
+                self.name + ('.track.log' if tracker == 'log' else '.track'),
+            )
+            checkpoints_path = os.path.join(
+                self.state_dir, self.name + '.checkpoints'
+            )
         else:
             track_path = ':memory:'
+            checkpoints_path = None
         if self.state_dir:
             self.lock_file = os.path.join(self.state_dir, self.name + '.lock')
         else:
             self.lock_file = None
-        self.tracker = Tracker(track_path)
+        if tracker == 'log':
+            self.tracker = LogTracker(
+                track_path, commit_interval=track_interval, read_only=read_only,
+            )
+        else:
+            self.tracker = Tracker(
+                track_path, commit_interval=track_interval, read_only=read_only,
+            )
+        self.checkpoints = compress.Checkpoints(checkpoints_path)
         self.sink = sink
+        if isinstance(sink, Sink):
+            sink.limits(batch_size=batch_size, batch_bytes=batch_bytes)
         self.backfill = backfill
         self.throttle_duration = throttle_duration
         self.throttle_backoff = throttle_backoff
@@ -181,6 +279,8 @@ class Channel(object):
         self.stats = stats
         self.stats_app = newrelic.agent.application() if self.stats else None
         self.flush_frequency = flush_frequency
+        self.pipeline = pipeline
+        self.parse_workers = parse_workers
 
     def match(self, path):
         """
@@ -283,7 +383,7 @@ class Channel(object):
         """
         return ChannelConsumer(self)
 
-    def consume(self, fo, source=None):
+    def consume(self, fo, source=None, jobs=None, since=None, until=None):
         """
         Convenience for consuming blocks from a source file.
 
@@ -293,6 +393,18 @@ class Channel(object):
         :param source:
             The source for `fo`. If None the channel will match to a source.
 
+        :param jobs:
+            Number of processes to parse `fo` with. If > 1 then `fo` must be
+            a regular file and sinks receive forms as plain `dict`s. See
+            `Source.parallel_batches`.
+
+        :param since:
+            Timestamp (`datetime` or seconds since the epoch) of the first
+            block to consume. See `Source.search`.
+
+        :param until:
+            Timestamp at which to stop consuming.
+
         :return:
             A tuple of:
 
@@ -304,15 +416,76 @@ class Channel(object):
         """
         st = time.time()
         with self.consumer() as consume:
-            consume(fo, source)
+            consume(fo, source, jobs, since, until)
         et = time.time()
         return consume.count, consume.bytes, consume.errors, et - st
 
 
+def _until(batches, end, fo):
+    for forms in batches(fo):
+        if forms[-1][1].begin >= end:
+            forms = [(f, block) for f, block in forms if block.begin < end]
+            if forms:
+                yield forms
+            return
+        yield forms
+
+
+def _pipeline(batches, depth, fo):
+    """
+    Generates `batches(fo)` read ahead by a thread into a queue of up to
+    `depth` batches. The thread is stopped when the generator is closed.
+    """
+    queue = Queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for forms in batches(fo):
+                if not put((forms, None)):
+                    return
+        except Exception:
+            put((None, sys.exc_info()))
+        else:
+            put((None, None))
+
+    thread = threading.Thread(target=produce, name='Pipeline-{0}'.format(
+        getattr(fo, 'name', '<memory>')
+    ))
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            forms, exc_info = queue.get()
+            if forms is None:
+                if exc_info:
+                    raise exc_info[0], exc_info[1], exc_info[2]
+                break
+            yield forms
+    finally:
+        stop.set()
+        thread.join()
+
+
 class ChannelConsumer(object):
 
+    #: Factor by which the per block flush latency of an adaptive batch can
+    #: exceed the average before the batch size is decreased.
+    latency_tolerance = 1.25
+
     def __init__(self, channel):
         self.channel = channel
+        self.batch_size = self.channel.batch_size
+        self.flush_latency = None
 
         self.sink = self.channel.sink
         self.reset_slack = self.channel.strict_slack
@@ -325,6 +498,29 @@ class ChannelConsumer(object):
         self.errors = 0
         self.flush_at = None
         self.pending_tracker = {}
+        self.pending_bytes = 0
+        self.pending_at = None
+        self.emitted = 0
+        self.pool = None
+
+    def start_pool(self):
+        """
+        The pool of `Channel.parse_workers` processes used to map blocks,
+        created on first use.
+        """
+        if self.pool is None:
+            logger.info(
+                '%s starting %s parse worker(s)',
+                self.channel.name, self.channel.parse_workers,
+            )
+            self.pool = parse_pool(self.channel.sources, self.channel.parse_workers)
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
 
     def stats(self):
 
@@ -341,7 +537,7 @@ class ChannelConsumer(object):
     def tally(self):
         return (self.count, self.pending, self.bytes, self.errors)
 
-    def __call__(self, fo, source=None):
+    def __call__(self, fo, source=None, jobs=None, since=None, until=None):
         # match and validate source
         if not source:
             source = self.channel.match(fo)
@@ -353,13 +549,38 @@ class ChannelConsumer(object):
             path = fo
             offset = self.pending_tracker.get(fo, None)
             with source.open(path, offset=offset) as fo:
-                return self.__call__(fo, source)
+                return self.__call__(fo, source, jobs, since, until)
 
         path = getattr(fo, 'name', '<memory>')
         logger.debug('%s:%s consuming from "%s" ... ', self.channel.name, source.name, path)
+        batches = source.batches
+        if getattr(source, 'shared', None) is not None and mappable(fo):
+            batches = source.shared_batches
+        elif self.channel.parse_workers:
+            batches = functools.partial(
+                source.pooled_batches,
+                pool=self.start_pool(),
+                jobs=self.channel.parse_workers,
+            )
+        if jobs and jobs > 1:
+            if not mappable(fo):
+                raise ValueError(
+                    'Cannot consume "{0}" with {1} jobs, it is not a regular file'
+                    .format(path, jobs)
+                )
+            batches = functools.partial(source.parallel_batches, jobs=jobs)
+        if until is not None:
+            offset = fo.tell()
+            end = source.search(fo, until)
+            fo.seek(offset, os.SEEK_SET)
+            batches = functools.partial(_until, batches, end)
+        if since is not None:
+            source.search(fo, since)
+        if self.channel.pipeline:
+            batches = functools.partial(_pipeline, batches, self.channel.pipeline)
         st = time.time()
-        with self.stats():
-            count, pending, bytes, errors = self.step(fo, source)
+        with self.stats(), self.tracker.defer():
+            count, pending, bytes, errors = self.step(fo, source, batches)
         et = time.time()
         offset = self.channel.tracker.get(path, None)
         delta = et - st
@@ -368,11 +589,13 @@ class ChannelConsumer(object):
             '%s:%s consumed %s (%s bytes) %s pending from "%s" @ %s in %0.4f sec(s)',
             self.channel.name, source.name, count, bytes, pending, path, offset or '-', delta
         )
-        if not bytes and seekable(fo):
+        if not bytes and seekable(fo) and until is None:
             self.tracker[path] = fo.tell()
         return count, pending, bytes, errors
 
-    def step(self, fo, source):
+    def step(self, fo, source, batches=None):
+        if batches is None:
+            batches = source.batches
         count = 0
         pending = 0
         bytes = 0
@@ -380,30 +603,40 @@ class ChannelConsumer(object):
         block = None
         while True:
             try:
-                for form, block in source.forms(fo):
-                    # pending
-                    if self.sink(form, block):
-                        self.pending_tracker[block.path] = block.end
-                        if not self.flush_at and self.channel.flush_frequency:
-                            self.flush_at = time.time() + self.channel.flush_frequency
-                        self.pending += 1
-                        pending += 1
-                        if self.pending >= self.channel.batch_size:
-                            logger.info(
-                                '%s:%s reached max batch size %s, flushing ...',
-                                self.channel.name, source.name, self.channel.batch_size
-                            )
-                            self.flush()
-                            count += pending
-                            pending = 0
-                    # emitted
-                    else:
-                        self.tracker[block.path] = block.end
-                        self.flushed()
-                        count += 1
-                        pending = 0
-                    self.bytes += block.end - block.begin
-                    bytes += block.end - block.begin
+                with contextlib.closing(batches(fo)) as batched:
+                    for forms in batched:
+                        for form, block in forms:
+                            # pending
+                            if self.sink(form, block):
+                                self.pending_tracker[block.path] = block.end
+                                if not self.flush_at and self.channel.flush_frequency:
+                                    self.flush_at = time.time() + self.channel.flush_frequency
+                                if not self.pending and self.channel.batch_latency:
+                                    self.pending_at = time.time()
+                                self.pending += 1
+                                self.pending_bytes += block.end - block.begin
+                                pending += 1
+                                limit = self.limit()
+                                if limit:
+                                    logger.info(
+                                        '%s:%s reached max batch %s, flushing ...',
+                                        self.channel.name, source.name, limit
+                                    )
+                                    self.flush()
+                                    count += pending
+                                    pending = 0
+                            # emitted
+                            else:
+                                self.tracker[block.path] = block.end
+                                self.flushed()
+                                count += 1
+                                pending = 0
+                                self.emitted += 1
+                                if self.batch_size and self.emitted >= self.batch_size:
+                                    self.tracker.commit()
+                                    self.emitted = 0
+                            self.bytes += block.end - block.begin
+                            bytes += block.end - block.begin
             except Exception, ex:
                 if not block:
                     raise
@@ -414,24 +647,57 @@ class ChannelConsumer(object):
             break
         return count, pending, bytes, errors
 
+    def limit(self):
+        """
+        Describes the batch limit pending blocks have reached, if any.
+        """
+        channel = self.channel
+        if self.pending >= self.batch_size:
+            return 'size {0}'.format(self.batch_size)
+        if channel.batch_bytes and self.pending_bytes >= channel.batch_bytes:
+            return 'bytes {0}'.format(channel.batch_bytes)
+        if (channel.batch_latency and
+            self.pending_at + channel.batch_latency <= time.time()):
+            return 'latency {0}'.format(channel.batch_latency)
+
+    @property
+    def flush_deadline(self):
+        """
+        When pending blocks must be flushed by, due to `flush_frequency` or
+        `batch_latency`, or None if there is no deadline.
+        """
+        deadline = self.flush_at or None
+        if self.pending_at is not None and self.channel.batch_latency:
+            latency_at = self.pending_at + self.channel.batch_latency
+            if deadline is None or latency_at < deadline:
+                deadline = latency_at
+        return deadline
+
     @property
     def flush_poll(self):
-        if not self.flush_at:
+        deadline = self.flush_deadline
+        if deadline is None:
             return
-        return max(0, time.time() - self.flush_at)
+        return max(0, deadline - time.time())
 
     @property
     def flush_expired(self):
         if not self.pending:
             return False
-        if not self.flush_at:
+        deadline = self.flush_deadline
+        if deadline is None:
             return True
-        return time.time() > self.flush_at
+        return time.time() >= deadline
 
     def flush(self):
         if self.pending:
+            limited = self.limit()
             st = time.time()
-            self.sink.flush()
+            try:
+                self.sink.flush()
+            except Exception:
+                self.adapt(None)
+                raise
             et = time.time()
             delta = et - st
             logger.info(
@@ -439,11 +705,56 @@ class ChannelConsumer(object):
             )
             for path, offset in self.pending_tracker.iteritems():
                 self.tracker[path] = offset
+            if limited:
+                self.adapt(delta / self.pending)
+        self.tracker.commit()
+        self.emitted = 0
         self.flushed()
 
+    def adapt(self, latency):
+        """
+        Adapts the batch size of an adaptive channel (see
+        `ChannelSettings.batch_adaptive`) to a flush.
+
+        :param latency:
+            Seconds per block it took to flush a batch that reached a limit or
+            None if flushing failed.
+        """
+        channel = self.channel
+        if not channel.batch_adaptive:
+            return
+        if latency is None or (
+                self.flush_latency is not None and
+                latency > self.flush_latency * self.latency_tolerance
+            ):
+            batch_size = self.batch_size // 2
+        elif self.flush_latency is None or latency <= self.flush_latency:
+            batch_size = self.batch_size + max(1, channel.batch_size // 10)
+        else:
+            batch_size = self.batch_size
+        batch_size = max(channel.batch_size_min, min(channel.batch_size_max, batch_size))
+        if latency is not None:
+            if self.flush_latency is None:
+                self.flush_latency = latency
+            else:
+                self.flush_latency = 0.8 * self.flush_latency + 0.2 * latency
+        if batch_size != self.batch_size:
+            logger.info(
+                '%s batch size %s -> %s', channel.name, self.batch_size, batch_size,
+            )
+            self.batch_size = batch_size
+        if channel.stats:
+            newrelic.agent.record_custom_metric(
+                'Custom/{0}/batch_size'.format(channel.name),
+                self.batch_size,
+                application=channel.stats_app,
+            )
+
     def flushed(self):
         self.count += self.pending
         self.pending = 0
+        self.pending_bytes = 0
+        self.pending_at = None
         self.flush_at = None
         self.slack = self.reset_slack
         self.pending_tracker.clear()
@@ -455,6 +766,8 @@ class ChannelConsumer(object):
         self.slack -= 1
         self.errors += self.pending + 1
         self.pending = 0
+        self.pending_bytes = 0
+        self.pending_at = None
         self.flush_at = None
         self.pending_tracker.clear()
         if block:
@@ -465,7 +778,10 @@ class ChannelConsumer(object):
         return self
 
     def __exit__(self, type, value, traceback):
-        self.flush()
+        try:
+            self.flush()
+        finally:
+            self.close()
 
 
 class EditForm(Form):
@@ -599,11 +915,25 @@ class ChannelLock(object):
 class Tracker(collections.MutableMapping):
     """
     File offset tracking as a mutable map backed by as sqlite db.
+
+    Offsets set within `defer` are buffered and committed together, in one
+    transaction, when it exits, when `commit` is called or every
+    `commit_interval` seconds. Those buffered when a process crashes are lost
+    so at most the blocks consumed since the last commit are replayed.
+
+    The db is write-ahead logged so readers, e.g. a `read_only` tracker used to
+    inspect offsets while a channel is being consumed, and the writer do not
+    block each other. Writers wait up to `timeout` seconds for one another.
     """
 
-    def __init__(self, path, timeout=None):
+    def __init__(self, path, timeout=5.0, commit_interval=None, read_only=False):
         self.path = path
         self.timeout = timeout
+        self.commit_interval = commit_interval
+        self.read_only = read_only
+        self.dirty = {}
+        self.deferred = 0
+        self.committed_at = time.time()
         self._cxn = None
 
     @property
@@ -611,8 +941,16 @@ class Tracker(collections.MutableMapping):
         if self._cxn:
             return self._cxn
         logger.debug('connecting to "%s"', self.path)
-        cxn = sqlite3.connect(self.path, timeout=self.timeout or 0.0)
+        path = self.path
+        if self.read_only and not os.path.exists(path):
+            path = ':memory:'
+        cxn = sqlite3.connect(path, timeout=self.timeout or 0.0)
         with contextlib.closing(cxn.cursor()) as cur:
+            if path != ':memory:':
+                if not self.read_only:
+                    cur.execute('PRAGMA journal_mode = WAL')
+                # NOTE: with WAL a crash may lose, but not corrupt, the last commit
+                cur.execute('PRAGMA synchronous = NORMAL')
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS tracks (
                     path TEXT,
@@ -622,10 +960,48 @@ class Tracker(collections.MutableMapping):
                 """
             )
             cxn.commit()
+            if self.read_only:
+                cur.execute('PRAGMA query_only = ON')
         self._cxn = cxn
         return self._cxn
 
+    @contextlib.contextmanager
+    def defer(self):
+        """
+        Context in which set offsets are buffered rather than committed
+        immediately.
+        """
+        self.deferred += 1
+        try:
+            yield self
+        finally:
+            self.deferred -= 1
+            if not self.deferred:
+                self.commit()
+
+    def commit(self):
+        """
+        Commits buffered offsets.
+        """
+        self.committed_at = time.time()
+        if not self.dirty:
+            return
+        with contextlib.closing(self.cxn.cursor()) as cur:
+            cur.executemany("""
+                INSERT OR REPLACE INTO tracks
+                (path, offset)
+                VALUES
+                (?, ?)
+                """,
+                self.dirty.iteritems()
+            )
+            self.cxn.commit()
+        logger.debug('track ("%s") committed %s offset(s)', self.path, len(self.dirty))
+        self.dirty.clear()
+
     def __getitem__(self, key):
+        if key in self.dirty:
+            return self.dirty[key]
         with contextlib.closing(self.cxn.cursor()) as cur:
             cur.execute("""
                 SELECT offset
@@ -639,27 +1015,22 @@ class Tracker(collections.MutableMapping):
             raise KeyError(key)
         return track[0]
 
+    def _writable(self):
+        if self.read_only:
+            raise ValueError('Tracker "{0}" is read-only'.format(self.path))
+
     def __setitem__(self, key, value):
-        with contextlib.closing(self.cxn.cursor()) as cur:
-            cur.execute("""
-                UPDATE tracks
-                SET offset = ?
-                WHERE path = ?
-                """,
-                (value, key))
-            if cur.rowcount == 0:
-                cur.execute("""
-                    INSERT INTO tracks
-                    (path, offset)
-                    VALUES
-                    (?, ?)
-                    """,
-                    (key, value)
-                )
-            self.cxn.commit()
+        self._writable()
+        self.dirty[key] = value
         logger.debug('track ("%s", "%s") offset %s', self.path, key, value)
+        if (not self.deferred or
+            self.commit_interval and
+            self.committed_at + self.commit_interval <= time.time()):
+            self.commit()
 
     def __delitem__(self, key):
+        self._writable()
+        self.commit()
         with contextlib.closing(self.cxn.cursor()) as cur:
             cur.execute("""
                 DELETE FROM tracks
@@ -673,6 +1044,7 @@ class Tracker(collections.MutableMapping):
         logger.debug('track ("%s", "%s") deleted', self.path, key)
 
     def __iter__(self):
+        self.commit()
         with contextlib.closing(self.cxn.cursor()) as cur:
             cur.execute('SELECT path FROM tracks')
             rows = cur.fetchall()
@@ -680,15 +1052,259 @@ class Tracker(collections.MutableMapping):
             yield row[0]
 
     def __len__(self):
+        self.commit()
         with contextlib.closing(self.cxn.cursor()) as cur:
             cur.execute('SELECT COUNT(*) FROM tracks')
             return cur.fetchone()[0]
 
 
+class LogTracker(collections.MutableMapping):
+    """
+    File offset tracking as a mutable map held in memory and backed by an
+    append-only log file of fixed-size records so setting an offset costs one
+    buffered write. Like `Tracker` offsets set within `defer` are flushed to
+    the log when it exits, when `commit` is called or every `commit_interval`
+    seconds and otherwise immediately.
+
+    When it has `compact_ratio` times more offset records than offsets the log
+    is compacted, on `commit`, by replacing it with a snapshot of the offsets.
+
+    Writers hold an exclusive lock on the log from the first offset they set
+    until they commit, waiting for any other writer to commit, and first load
+    records others wrote so several processes (e.g. `watch` and `channel
+    touch`) can safely write to the same log.
+    """
+
+    #: (kind, path id, value) log record. A `PATH` record's value is the length
+    #: of the path following it, an `OFFSET`'s is the offset of the path with
+    #: that id and a `DELETE`'s is ignored.
+    record = struct.Struct('<cIq')
+
+    PATH = 'p'
+
+    OFFSET = 'o'
+
+    DELETE = 'd'
+
+    def __init__(self,
+            path,
+            commit_interval=None,
+            read_only=False,
+            compact_ratio=4,
+            compact_size=1024,
+        ):
+        self.path = None if path == ':memory:' else path
+        self.commit_interval = commit_interval
+        self.read_only = read_only
+        self.compact_ratio = compact_ratio
+        self.compact_size = compact_size
+        self.deferred = 0
+        self.committed_at = time.time()
+        self._fo = None
+        self._stat = None
+        self._load()
+
+    def _load(self):
+        self.offsets = {}
+        self.ids = {}
+        self.updates = 0
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as fo:
+            buf = fo.read()
+            self._stat = os.fstat(fo.fileno())
+        paths = {}
+        i = 0
+        while i + self.record.size <= len(buf):
+            kind, path_id, value = self.record.unpack_from(buf, i)
+            if kind == self.PATH:
+                if i + self.record.size + value > len(buf):
+                    break
+                i += self.record.size
+                paths[path_id] = buf[i:i + value].decode('utf-8')
+                i += value
+                continue
+            if kind == self.OFFSET:
+                self.offsets[paths[path_id]] = value
+            elif kind == self.DELETE:
+                self.offsets.pop(paths[path_id], None)
+            else:
+                raise ValueError('"{0}" @ {1} has invalid record kind {2!r}'.format(
+                    self.path, i, kind
+                ))
+            self.updates += 1
+            i += self.record.size
+        self.ids = dict((path, path_id) for path_id, path in paths.iteritems())
+        if i < len(buf) and not self.read_only:
+            if self._fo is None:
+                # NOTE: possibly being written, truncate once locked
+                self._stat = None
+                return
+            # NOTE: partial write
+            logger.warning('"%s" truncating partial record @ %s', self.path, i)
+            with open(self.path, 'r+b') as fo:
+                fo.truncate(i)
+
+    def _refresh(self):
+        # NOTE: read-only trackers follow the log as others write to it
+        if not self.read_only or not self.path:
+            return
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        if (self._stat is None or
+            (st.st_ino, st.st_size) != (self._stat.st_ino, self._stat.st_size)):
+            self._load()
+
+    def _writable(self):
+        if self.read_only:
+            raise ValueError('Tracker "{0}" is read-only'.format(self.path))
+
+    def _acquire(self):
+        """
+        Opens and exclusively locks the log for appending, waiting for any
+        other writer, and loads records written since it was last loaded.
+        """
+        import fcntl
+
+        if self._fo is not None or not self.path:
+            return
+        while True:
+            fo = open(self.path, 'ab')
+            fcntl.flock(fo.fileno(), fcntl.LOCK_EX)
+            st = os.fstat(fo.fileno())
+            try:
+                current = os.stat(self.path)
+            except OSError:
+                current = None
+            if current is not None and current.st_ino == st.st_ino:
+                break
+            # NOTE: replaced by another writer's compaction
+            fo.close()
+        self._fo = fo
+        if (self._stat is None or
+            (st.st_ino, st.st_size) != (self._stat.st_ino, self._stat.st_size)):
+            self._load()
+
+    def _release(self):
+        if self._fo is None:
+            return
+        self._fo.flush()
+        self._stat = os.stat(self.path)
+        self._fo.close()
+        self._fo = None
+
+    def _write(self, kind, key, value):
+        if not self.path:
+            return
+        self._acquire()
+        if key not in self.ids:
+            self.ids[key] = len(self.ids)
+            raw = key.encode('utf-8') if isinstance(key, unicode) else key
+            self._fo.write(self.record.pack(self.PATH, self.ids[key], len(raw)) + raw)
+        self._fo.write(self.record.pack(kind, self.ids[key], value))
+        self.updates += 1
+
+    @contextlib.contextmanager
+    def defer(self):
+        """
+        Context in which set offsets are buffered rather than flushed
+        immediately.
+        """
+        self.deferred += 1
+        try:
+            yield self
+        finally:
+            self.deferred -= 1
+            if not self.deferred:
+                self.commit()
+
+    def commit(self):
+        """
+        Flushes buffered offsets to the log and compacts it if needed.
+        """
+        self.committed_at = time.time()
+        if self._fo is None:
+            return
+        self._fo.flush()
+        if self.updates > max(self.compact_size, self.compact_ratio * len(self.offsets)):
+            self.compact()
+        self._release()
+
+    def compact(self):
+        """
+        Replaces the log with a snapshot of the current offsets.
+        """
+        self._writable()
+        if not self.path:
+            return
+        self._acquire()
+        # NOTE: the lock on the replaced log is held until it is replaced
+        locked, updates = self._fo, self.updates
+        self.ids, self.updates = {}, 0
+        tmp_path = self.path + '.tmp'
+        self._fo = open(tmp_path, 'wb')
+        try:
+            for key, value in self.offsets.iteritems():
+                self._write(self.OFFSET, key, value)
+            self._fo.flush()
+            os.fsync(self._fo.fileno())
+            os.rename(tmp_path, self.path)
+        finally:
+            self._fo.close()
+            self._fo = locked
+        self._release()
+        logger.info(
+            'track ("%s") compacted %s record(s) to %s', self.path, updates, self.updates,
+        )
+
+    def close(self):
+        self._release()
+
+    def __getitem__(self, key):
+        self._refresh()
+        return self.offsets[key]
+
+    def __setitem__(self, key, value):
+        self._writable()
+        self._acquire()
+        self.offsets[key] = value
+        self._write(self.OFFSET, key, value)
+        logger.debug('track ("%s", "%s") offset %s', self.path, key, value)
+        if (not self.deferred or
+            self.commit_interval and
+            self.committed_at + self.commit_interval <= time.time()):
+            self.commit()
+
+    def __delitem__(self, key):
+        self._writable()
+        self._acquire()
+        if key not in self.offsets:
+            if not self.deferred:
+                self._release()
+            raise KeyError(key)
+        del self.offsets[key]
+        self._write(self.DELETE, key, 0)
+        self.commit()
+        logger.debug('track ("%s", "%s") deleted', self.path, key)
+
+    def __iter__(self):
+        self._refresh()
+        return iter(list(self.offsets))
+
+    def __len__(self):
+        self._refresh()
+        return len(self.offsets)
+
+
 class ChannelSource(Source):
 
     def __init__(self, channel, *args, **kwargs):
         self.channel = channel
+        #: `SharedSource` parsing this source for several channels, see `share`.
+        self.shared = None
+        kwargs.setdefault('state_dir', channel.state_dir)
         super(ChannelSource, self).__init__(*args, **kwargs)
 
     def seek(self, path, offset):
@@ -696,6 +1312,9 @@ class ChannelSource(Source):
             raise ValueError('"{0}" does not match pattern "{1}"'.format(
                 path, self.glob.pattern
             ))
+        if offset:
+            with compress.open(path) as fo:
+                offset = self.align(fo, offset)
         self.channel.tracker[path] = offset
         logger.debug('%s:%s "%s" offset %s', self.channel.name, self.name, path, offset)
         return offset
@@ -722,7 +1341,14 @@ class ChannelSource(Source):
                 path, self.glob.pattern
             ))
         logger.debug('%s:%s opening "%s"', self.channel.name, self.name, path)
-        fo = open(path, 'r')
+        checkpoints = None
+        if compress.codec(path):
+            checkpoints = self.channel.checkpoints.get(path, os.stat(path).st_ino)
+        fo = compress.open(
+            path,
+            checkpoints=checkpoints,
+            on_close=self.channel.checkpoints.update,
+        )
         if offset:
             fo.seek(offset, os.SEEK_SET)
         elif path in self.channel.tracker:
@@ -733,8 +1359,21 @@ class ChannelSource(Source):
         logger.debug('%s:%s "%s" @ %s', self.channel.name, self.name, path, fo.tell())
         return fo
 
-    def forms(self, fo):
-        for form, offset in super(ChannelSource, self).forms(fo):
+    def shared_batches(self, fo, max_blocks=1024, max_bytes=None):
+        """
+        Like `batches` but source forms are parsed by, and possibly shared
+        with other channels through, this source's `SharedSource`.
+        """
+        for forms in self.shared.batches(self, fo, max_blocks, max_bytes):
+            forms = list(self._channel_forms(forms))
+            if forms:
+                yield forms
+
+    def _forms(self, batch):
+        return self._channel_forms(super(ChannelSource, self)._forms(batch))
+
+    def _channel_forms(self, forms):
+        for form, offset in forms:
             if self.channel.form:
                 src = form
                 form = self.channel.form()
@@ -747,19 +1386,160 @@ class ChannelSource(Source):
                         self.channel.name, self.name, offset, errors[0]
                     )
                     continue
-            if self.channel.filter and not self.channel.filter(form, offset):
+            if (self.channel.filter and
+                self.channel.filter_fields is None and
+                not self.channel.filter(form, offset)):
                 continue
             yield form, offset
 
+    def _match_filters(self):
+        match_filters = super(ChannelSource, self)._match_filters()
+        if self.channel.filter and self.channel.filter_fields is not None:
+            match_filters.append((self.channel.filter, self.channel.filter_fields))
+        return match_filters
+
     def consume(self, fo):
         return self.channel.consume(fo, self)
 
 
+def share(channels, max_batches=64):
+    """
+    Shares parsing of files from sources with the same name (i.e. from the same
+    configuration) between channels. Channels whose `filter` reads raw groups
+    (see `ChannelSettings.filter_fields`) or that map blocks with parse workers
+    (see `ChannelSettings.parse_workers`) are not shared.
+
+    :param channels:
+        `Channel`s to share sources between.
+
+    :param max_batches:
+        Maximum number of parsed batches each `SharedSource` holds for channels
+        that have not consumed them yet.
+
+    :return:
+        List of `SharedSource`s.
+    """
+    sources = collections.defaultdict(list)
+    for channel in channels:
+        if channel.filter_fields is not None or channel.parse_workers:
+            continue
+        for source in channel.sources:
+            sources[source.name].append(source)
+    shared = []
+    for name, subscribers in sorted(sources.iteritems()):
+        if len(subscribers) < 2:
+            continue
+        shared_source = SharedSource(name, len(subscribers), max_batches)
+        for source in subscribers:
+            source.shared = shared_source
+        shared.append(shared_source)
+        logger.info(
+            'sharing source %s between channels %s',
+            name, ', '.join(source.channel.name for source in subscribers),
+        )
+    return shared
+
+
+class SharedSource(object):
+    """
+    Parses batches of blocks for the sources of several channels once. Each
+    parsed batch is keyed by the file and offset it was parsed from and held
+    until every other subscribed channel has consumed from that offset or
+    until `max_batches` newer batches have been parsed. Only one channel at a
+    time parses from a given offset, others wait for its batch.
+
+    Channels still map, filter, sink and track the shared source forms (which
+    must be treated as read-only) independently.
+    """
+
+    def __init__(self, name, subscribers, max_batches=64):
+        self.name = name
+        self.subscribers = subscribers
+        self.max_batches = max_batches
+        self.parsed = collections.OrderedDict()
+        self.parsing = set()
+        self.cond = threading.Condition()
+        self.hits = 0
+        self.misses = 0
+
+    def batches(self, source, fo, max_blocks=1024, max_bytes=None):
+        """
+        Generator for lists of source (form, block) tuples, i.e. before any
+        channel mapping or filtering, read from the regular file `fo`.
+        """
+        identity = _identity(fo)
+        offset = fo.tell()
+        extract = functools.partial(Source._forms, source)
+        parsed = None
+        while True:
+            key = identity + (offset,)
+            shared = self._claim(key)
+            if shared is not None:
+                parsed = None
+                forms, offset = shared
+                fo.seek(offset, os.SEEK_SET)
+                if forms:
+                    yield forms
+                continue
+            try:
+                if parsed is None:
+                    fo.seek(offset, os.SEEK_SET)
+                    parsed = source._batches(fo, extract, max_blocks, max_bytes)
+                batch, forms, exc_info = next(parsed, (None, None, None))
+            except Exception:
+                self._release(key)
+                raise
+            if batch is None:
+                self._release(key)
+                break
+            if exc_info:
+                self._release(key)
+                if forms:
+                    yield forms
+                raise exc_info[0], exc_info[1], exc_info[2]
+            self._release(key, forms, batch.end)
+            offset = batch.end
+            if forms:
+                yield forms
+
+    def _claim(self, key):
+        with self.cond:
+            while key in self.parsing:
+                self.cond.wait()
+            shared = self.parsed.get(key)
+            if shared is None:
+                self.misses += 1
+                self.parsing.add(key)
+                return None
+            self.hits += 1
+            shared[2] -= 1
+            if not shared[2]:
+                del self.parsed[key]
+            return shared[0], shared[1]
+
+    def _release(self, key, forms=None, end=None):
+        with self.cond:
+            self.parsing.discard(key)
+            if end is not None:
+                self.parsed[key] = [forms, end, self.subscribers - 1]
+                while len(self.parsed) > self.max_batches:
+                    self.parsed.popitem(last=False)
+            self.cond.notify_all()
+
+
+def _identity(fo):
+    # NOTE: so batches of a rotated file are not shared
+    return fo.name, os.fstat(fo.fileno()).st_ino
+
+
 class ChannelWorker(threading.Thread):
 
     def __init__(self, channel, **kwargs):
         self.channel = channel
         self.consume = self.channel.consumer()
+        if channel.parse_workers:
+            # NOTE: fork parse workers before this or any other thread starts
+            self.consume.start_pool()
         self.throttle = Throttle(
             duration=channel.throttle_duration,
             cap=channel.throttle_cap,
@@ -833,8 +1613,9 @@ class ChannelWorker(threading.Thread):
             self.consume.flush()
         try:
             timeout = self.queue_poll
-            if self.consume.flush_poll:
-                timeout = min(self.consume.flush_poll, self.queue_poll)
+            flush_poll = self.consume.flush_poll
+            if flush_poll is not None:
+                timeout = min(flush_poll, self.queue_poll)
             event = self.queue.get(block=True, timeout=timeout)
         except Queue.Empty:
             return False
@@ -0,0 +1,308 @@
+"""
+Streaming decompression of rotated (e.g. by logrotate) source files like:
+
+    - /var/log/nginx/access.log.2.gz
+    - /var/log/nginx/access.log.3.bz2
+    - /var/log/nginx/access.log.4.xz
+
+so they can be consumed without decompressing them to disk first. Use it like
+the builtin `open`:
+
+.. code::
+
+    import slurp
+
+    with slurp.compress.open('/var/log/nginx/access.log.2.gz') as fo:
+        for block in slurp.Blocks(fo):
+            print block.begin, block.end
+
+Offsets (i.e. `tell`, `seek` and so `Block.begin` and `Block.end`) are in
+uncompressed coordinates. A decompressor can only be started fresh at the
+beginning of a compressed member (gzip) or stream (bz2, xz) so these are
+recorded as checkpoints while reading. Seeking restarts from the nearest
+checkpoint and then inflates and discards up to the target offset, and
+persisting checkpoints (see `Checkpoints`) lets a restart resume mid-file
+without inflating from byte zero for multi-member files (e.g. concatenated
+rotations or `pigz --independent`/`xz -T` style output).
+"""
+import __builtin__
+import bisect
+import bz2
+import json
+import logging
+import os
+import tempfile
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+
+__all__ = [
+    'Checkpoints',
+    'DecompressingFile',
+    'codec',
+    'open',
+]
+
+logger = logging.getLogger(__name__)
+
+
+def _gzip():
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+#: Mapping of file extensions to decompressor factories.
+CODECS = {
+    '.gz': _gzip,
+    '.bz2': bz2.BZ2Decompressor,
+}
+
+if lzma:
+    CODECS['.xz'] = lzma.LZMADecompressor
+    CODECS['.lzma'] = lzma.LZMADecompressor
+
+
+def codec(path):
+    """
+    Determines the decompressor factory for a path or None if the path is not
+    compressed.
+    """
+    return CODECS.get(os.path.splitext(path)[1])
+
+
+def open(path, checkpoints=None, on_close=None):
+    """
+    Opens a path for reading, transparently decompressing it if its extension
+    is that of a known compression format.
+
+    :param checkpoints:
+        Sequence of previously recorded (offset, compressed offset) checkpoints
+        for `path`. See `DecompressingFile`.
+
+    :param on_close:
+        Callable invoked with the file when it is closed. Only used if `path`
+        is compressed.
+    """
+    factory = codec(path)
+    if factory is None:
+        return __builtin__.open(path, 'r')
+    return DecompressingFile(
+        path, factory, checkpoints=checkpoints, on_close=on_close
+    )
+
+
+class DecompressingFile(object):
+    """
+    Read-only, seekable file-like object decompressing a file as it is read.
+    Note that it has no `fileno` so is never treated as a regular file (e.g.
+    memory mapped).
+    """
+
+    def __init__(self, path, codec, checkpoints=None, read_size=65536, on_close=None):
+        """
+        :param path:
+            Path to the compressed file.
+
+        :param codec:
+            Decompressor factory, see `CODECS`.
+
+        :param checkpoints:
+            Sequence of (offset, compressed offset) pairs where a decompressor
+            can be started.
+
+        :param read_size:
+            Number of compressed bytes to read at a time.
+
+        :param on_close:
+            Callable invoked with this file when it is closed.
+        """
+        self.name = path
+        self.codec = codec
+        self.read_size = read_size
+        self.on_close = on_close
+        self.checkpoints = sorted(set(map(tuple, checkpoints or [])) | set([(0, 0)]))
+        self.fo = __builtin__.open(path, 'rb')
+        self.inode = os.fstat(self.fo.fileno()).st_ino
+        self.closed = False
+        self._restart(*self.checkpoints[0])
+
+    def _restart(self, offset, compressed_offset):
+        logger.debug(
+            '"%s" decompressing @ %s from %s', self.name, offset, compressed_offset
+        )
+        self.fo.seek(compressed_offset, os.SEEK_SET)
+        self.decompressor = self.codec()
+        self.pos = offset
+        self.buf = ''
+        self.buf_pos = 0
+        self.eof = False
+
+    def _checkpoint(self, offset, compressed_offset):
+        checkpoint = (offset, compressed_offset)
+        index = bisect.bisect_left(self.checkpoints, checkpoint)
+        if index < len(self.checkpoints) and self.checkpoints[index] == checkpoint:
+            return
+        logger.debug(
+            '"%s" checkpoint @ %s from %s', self.name, offset, compressed_offset
+        )
+        self.checkpoints.insert(index, checkpoint)
+
+    def _inflate(self):
+        data = self.fo.read(self.read_size)
+        if not data:
+            self.eof = True
+            return
+        parts = [self.buf[self.buf_pos:]]
+        inflated = len(parts[0])
+        while data:
+            try:
+                out = self.decompressor.decompress(data)
+            except (IOError, EOFError, zlib.error), ex:
+                # NOTE: e.g. zero padding after the last member
+                logger.warning(
+                    '"%s" @ %s - %s, ignoring remaining %s byte(s)',
+                    self.name, self.pos + inflated, ex, len(data),
+                )
+                self.eof = True
+                break
+            parts.append(out)
+            inflated += len(out)
+            data = self.decompressor.unused_data
+            if data:
+                # member or stream ended, start another
+                self._checkpoint(
+                    self.pos + inflated, self.fo.tell() - len(data)
+                )
+                self.decompressor = self.codec()
+        self.buf = ''.join(parts)
+        self.buf_pos = 0
+
+    def read(self, size=-1):
+        while (size < 0 or len(self.buf) - self.buf_pos < size) and not self.eof:
+            self._inflate()
+        if size < 0:
+            end = len(self.buf)
+        else:
+            end = min(len(self.buf), self.buf_pos + size)
+        data = self.buf[self.buf_pos:end]
+        self.buf_pos = end
+        self.pos += len(data)
+        return data
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.pos
+        elif whence == os.SEEK_END:
+            while self.read(1024 * 1024):
+                pass
+            offset += self.pos
+        if offset < 0:
+            raise IOError('Invalid offset {0}'.format(offset))
+        index = bisect.bisect_right(self.checkpoints, (offset, float('inf'))) - 1
+        checkpoint = self.checkpoints[index]
+        if offset < self.pos or checkpoint[0] > self.pos:
+            self._restart(*checkpoint)
+        while self.pos < offset:
+            if not self.read(min(offset - self.pos, 1024 * 1024)):
+                break
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.fo.close()
+        if self.on_close:
+            self.on_close(self)
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            yield line
+
+    def readline(self):
+        while True:
+            index = self.buf.find('\n', self.buf_pos)
+            if index != -1 or self.eof:
+                break
+            self._inflate()
+        end = len(self.buf) if index == -1 else index + 1
+        data = self.buf[self.buf_pos:end]
+        self.buf_pos = end
+        self.pos += len(data)
+        return data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+class Checkpoints(object):
+    """
+    Persists `DecompressingFile` checkpoints per path in a JSON file, typically
+    in the state directory. Checkpoints are keyed by inode as well as path so
+    they are discarded if a path is reused by a different file (e.g. rotated).
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path:
+            File to persist checkpoints to or None to only keep them in memory.
+        """
+        self.path = path
+        self._state = None
+
+    @property
+    def state(self):
+        if self._state is None:
+            self._state = {}
+            if self.path and os.path.isfile(self.path):
+                with __builtin__.open(self.path, 'r') as fo:
+                    self._state = json.load(fo)
+        return self._state
+
+    def get(self, path, inode):
+        entry = self.state.get(path)
+        if not entry or entry['inode'] != inode:
+            return []
+        return entry['checkpoints']
+
+    def update(self, fo):
+        """
+        Records the checkpoints of a `DecompressingFile`, e.g. when closed.
+        """
+        entry = {
+            'inode': fo.inode,
+            'checkpoints': map(list, fo.checkpoints),
+        }
+        if self.state.get(fo.name) == entry:
+            return
+        self.state[fo.name] = entry
+        self.save()
+
+    def discard(self, path):
+        if self.state.pop(path, None) is not None:
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        fd, tmp_path = tempfile.mkstemp(
+            prefix='.slurp-', dir=os.path.dirname(self.path) or '.'
+        )
+        with os.fdopen(fd, 'w') as fo:
+            json.dump(self.state, fo)
+        os.rename(tmp_path, self.path)
+        logger.debug('saved checkpoints to "%s"', self.path)
@@ -223,7 +223,11 @@ class Config(object):
         """
         Loads `Source` instance for a name source.
         """
-        return Source(name=name, **self.source_settings(name, **overrides))
+        return Source(
+            name=name,
+            state_dir=self.state_dir,
+            **self.source_settings(name, **overrides)
+        )
 
     @property
     def sink_names(self):
@@ -11,6 +11,13 @@ except ImportError, ex:
 except Exception, ex:
     logger.exception('unable to load elastic search extension\n')
 
+try:
+    from elasticsearch_bulk import ElasticSearchBulk
+except ImportError, ex:
+    logger.warning('unable to load elastic search bulk extension - %s', ex)
+except Exception, ex:
+    logger.exception('unable to load elastic search bulk extension\n')
+
 try:
     from sentry import Sentry
 except ImportError, ex:
@@ -0,0 +1,413 @@
+"""
+Sink for bulk indexing form(s) to elasticsearch without pyes. Documents are
+serialized straight to newline delimited JSON `_bulk` bodies which are sent,
+several at a time, over keep-alive connections while the channel carries on
+sinking. Typical usage is:
+
+.. code:: text
+
+    [sink:nginx-es]
+    type = ElasticSearchBulk
+    connections = http://es1.example.org:9200, http://es2.example.org:9200
+    bulk_size = 1000
+    concurrency = 4
+    retries = 3
+    compression = gzip
+
+Forms are expected to have:
+
+- ``index``, the index name
+- ``type``, the document type
+- ``id``, the document id, optional
+- ``document``, the document
+
+Items of a bulk request that fail with a transient status (e.g. 429) are
+retried, and only those items, up to `retries` times. `flush` waits for all
+in-flight requests and raises `BulkError` if any item could not be indexed.
+
+Unless ``bulk_size`` is set each of a channel's batches is split into
+``concurrency`` bulk requests, so that many are in-flight at once when the
+channel flushes.
+
+With ``compression = gzip`` bodies are compressed as documents are buffered,
+rather than once a request is sent, so only the compressed body is held.
+"""
+import base64
+import collections
+import httplib
+import json
+import logging
+import Queue
+import sys
+import threading
+import time
+import urlparse
+import zlib
+
+from .. import serialize, settings, Settings, Sink
+
+
+logger = logging.getLogger(__name__)
+
+
+class ElasticSearchBulkSettings(Settings):
+
+    #: List of elasticsearch servers (e.g. https://es.example.org:9200).
+    connections = settings.List(settings.String()).min(1)
+
+    #: A (username, password) tuple for authenticating with elasticsearch servers.
+    creds = settings.Tuple((settings.String(), settings.String()), default=None)
+
+    #: Request timeout in seconds.
+    timeout = settings.Integer(default=10).min(0)
+
+    #: Number of documents per bulk request. Defaults to the channel's
+    #: `batch_size` split across `concurrency` requests.
+    bulk_size = settings.Integer(default=None).min(1)
+
+    #: Maximum number of serialized document bytes per bulk request. Defaults
+    #: to the channel's `batch_bytes`, if it has one.
+    bulk_bytes = settings.Integer(default=None).min(1)
+
+    #: Maximum number of bulk requests in-flight, and so connections, at once.
+    concurrency = settings.Integer(default=2).min(1)
+
+    #: Number of times a document that failed with a transient error is
+    #: retried.
+    retries = settings.Integer(default=3).min(0)
+
+    #: Seconds to wait before retrying failed documents, doubled each retry.
+    retry_backoff = settings.Float(default=0.5).min(0)
+
+    #: How bulk request bodies are compressed, "gzip" or none.
+    compression = settings.String(default=None, choices=['gzip'])
+
+    #: Compression level from 1 (fastest) to 9 (smallest).
+    compression_level = settings.Integer(default=6).min(1).max(9)
+
+
+class BulkError(Exception):
+    """
+    Raised when documents could not be indexed. `failures` is a list of
+    (action, status, error) tuples for them.
+    """
+
+    def __init__(self, failures):
+        self.failures = failures
+        action, status, error = failures[0]
+        super(BulkError, self).__init__(
+            '{0} document(s) failed, e.g. {1} - {2} {3}'.format(
+                len(failures), action, status, error
+            )
+        )
+
+
+class ConnectionPool(object):
+    """
+    Pool of keep-alive HTTP connections to elasticsearch servers, which are
+    used round-robin as connections are created.
+    """
+
+    def __init__(self, urls, size, timeout=None, creds=None):
+        self.urls = [urlparse.urlsplit(url) for url in urls]
+        self.size = size
+        self.timeout = timeout
+        self.headers = {'Content-Type': 'application/x-ndjson'}
+        if creds:
+            self.headers['Authorization'] = 'Basic ' + base64.b64encode(':'.join(creds))
+        self.idle = Queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        url = self.urls[self.created % len(self.urls)]
+        self.created += 1
+        cls = httplib.HTTPSConnection if url.scheme == 'https' else httplib.HTTPConnection
+        return url.path.rstrip('/'), cls(url.hostname, url.port, timeout=self.timeout)
+
+    def get(self):
+        with self.lock:
+            if self.idle.empty() and self.created < self.size:
+                return self._connect()
+        return self.idle.get()
+
+    def put(self, cxn):
+        self.idle.put(cxn)
+
+    def request(self, method, path, chunks, headers=None):
+        """
+        Sends a request with a body of `chunks` and returns its (status, body).
+        Connections that fail are closed and so re-opened when next used.
+        """
+        prefix, cxn = self.get()
+        try:
+            cxn.putrequest(method, prefix + path, skip_accept_encoding=True)
+            for name, value in self.headers.items() + (headers or {}).items():
+                cxn.putheader(name, value)
+            cxn.putheader('Content-Length', str(sum(len(chunk) for chunk in chunks)))
+            pieces = _pieces(chunks)
+            cxn.endheaders(next(pieces, None))
+            for piece in pieces:
+                cxn.send(piece)
+            response = cxn.getresponse()
+            return response.status, response.read()
+        except Exception:
+            cxn.close()
+            raise
+        finally:
+            self.put((prefix, cxn))
+
+    def close(self):
+        while not self.idle.empty():
+            self.idle.get()[1].close()
+
+
+def _pieces(chunks, size=65536):
+    # NOTE: joins small chunks so each is not sent on its own
+    buf, buf_size = [], 0
+    for chunk in chunks:
+        buf.append(chunk)
+        buf_size += len(chunk)
+        if buf_size >= size:
+            yield ''.join(buf)
+            buf, buf_size = [], 0
+    if buf:
+        yield ''.join(buf)
+
+
+class BulkBody(object):
+    """
+    A `_bulk` request body built, and optionally compressed, a document at a
+    time.
+    """
+
+    def __init__(self, compression=None, level=6):
+        """
+        :param compression:
+            "gzip" or None.
+
+        :param level:
+            Compression level.
+        """
+        self.compression = compression
+        self.compressor = None
+        if compression == 'gzip':
+            self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self.chunks = []
+        self.raw_size = 0
+        self.attempts = []
+
+    def __len__(self):
+        return len(self.attempts)
+
+    def add(self, action, source, attempts=0):
+        """
+        Adds a document's serialized action and source lines.
+
+        :param attempts:
+            Number of times the document has already been sent.
+        """
+        for line in (action, source):
+            self.raw_size += len(line)
+            if self.compressor is not None:
+                line = self.compressor.compress(line)
+            if line:
+                self.chunks.append(line)
+        self.attempts.append(attempts)
+
+    def close(self):
+        """
+        Completes the body, after which no documents can be added.
+        """
+        if self.compressor is not None:
+            self.chunks.append(self.compressor.flush())
+            self.compressor = None
+
+    @property
+    def headers(self):
+        if self.compression:
+            return {'Content-Encoding': self.compression}
+        return {}
+
+    def docs(self):
+        """
+        Generates the (action, source, attempts) of each document.
+        """
+        raw = ''.join(self.chunks)
+        if self.compression == 'gzip':
+            raw = zlib.decompress(raw, 16 + zlib.MAX_WBITS)
+        lines = iter(raw.split('\n'))
+        for attempts in self.attempts:
+            yield next(lines) + '\n', next(lines) + '\n', attempts
+
+
+class Bulk(object):
+    """
+    A `_bulk` request in-flight.
+    """
+
+    def __init__(self, body):
+        self.body = body
+        self.done = threading.Event()
+        self.response = None
+        self.exc_info = None
+
+
+def _encode(value):
+    return serialize.dumps(value) + '\n'
+
+
+class ElasticSearchBulk(Sink):
+
+    settings = ElasticSearchBulkSettings
+
+    #: Item statuses that are retried.
+    retry_statuses = frozenset([429, 500, 502, 503, 504])
+
+    #: Number of documents per bulk request if neither `bulk_size` nor the
+    #: channel's batch size is known.
+    default_bulk_size = 400
+
+    def __init__(self,
+            name,
+            connections,
+            creds=None,
+            timeout=10,
+            bulk_size=None,
+            concurrency=2,
+            retries=3,
+            retry_backoff=0.5,
+            bulk_bytes=None,
+            compression=None,
+            compression_level=6,
+        ):
+        super(ElasticSearchBulk, self).__init__(name)
+        self.pool = ConnectionPool(connections, concurrency, timeout, creds)
+        self.bulk_size = bulk_size
+        self.bulk_bytes = bulk_bytes
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.compression = compression
+        self.compression_level = compression_level
+        self.body = self._body()
+        self.inflight = collections.deque()
+        self.retrying = []
+        self.failures = []
+        self.requests = Queue.Queue()
+        self.workers = []
+
+    def _body(self):
+        return BulkBody(self.compression, self.compression_level)
+
+    def _start(self):
+        while len(self.workers) < self.concurrency:
+            worker = threading.Thread(
+                target=self._work,
+                name='{0}-{1}'.format(self.name, len(self.workers)),
+            )
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def _work(self):
+        while True:
+            bulk = self.requests.get()
+            try:
+                bulk.response = self.pool.request(
+                    'POST', '/_bulk', bulk.body.chunks, bulk.body.headers,
+                )
+            except Exception:
+                bulk.exc_info = sys.exc_info()
+            bulk.done.set()
+
+    def submit(self):
+        """
+        Sends buffered documents as a bulk request, first waiting for the
+        oldest in-flight one if there are already `concurrency` of them.
+        """
+        if not self.body:
+            return
+        while len(self.inflight) >= self.concurrency:
+            self.wait(self.inflight.popleft())
+        body, self.body = self.body, self._body()
+        body.close()
+        bulk = Bulk(body)
+        self._start()
+        self.requests.put(bulk)
+        self.inflight.append(bulk)
+
+    def wait(self, bulk):
+        """
+        Waits for an in-flight bulk request and sorts its failed documents
+        into those to retry and those that have failed.
+        """
+        bulk.done.wait()
+        if bulk.exc_info is not None:
+            status, error = None, bulk.exc_info[1]
+            logger.warning('%s bulk request failed - %s', self.name, error)
+            items = [(status, error)] * len(bulk.body)
+        else:
+            status, body = bulk.response
+            if status != 200:
+                logger.warning('%s bulk request failed - %s %s', self.name, status, body)
+                items = [(status, body)] * len(bulk.body)
+            else:
+                response = json.loads(body)
+                if not response.get('errors'):
+                    return
+                items = []
+                for item in response['items']:
+                    result = item.values()[0]
+                    items.append((result['status'], result.get('error')))
+        for (action, source, attempts), (status, error) in zip(bulk.body.docs(), items):
+            if status is not None and status < 300:
+                continue
+            if (status is None or status in self.retry_statuses) and attempts < self.retries:
+                self.retrying.append((action, source, attempts + 1))
+            else:
+                self.failures.append((action.rstrip(), status, error))
+
+    def buffer(self, doc):
+        """
+        Buffers a document, submitting buffered ones once there are `bulk_size`
+        of them or they total `bulk_bytes`.
+        """
+        self.body.add(*doc)
+        if (len(self.body) >= (self.bulk_size or self.default_bulk_size) or
+            self.bulk_bytes and self.body.raw_size >= self.bulk_bytes):
+            self.submit()
+
+    # Sink
+
+    def __call__(self, form, block):
+        action = {'_index': form['index'], '_type': form['type']}
+        if form.get('id', None) is not None:
+            action['_id'] = form['id']
+        self.buffer((_encode({'index': action}), _encode(form['document']), 0))
+        return True  # NOTE: True means pending
+
+    def limits(self, batch_size=None, batch_bytes=None):
+        if self.bulk_size is None and batch_size:
+            # NOTE: round up so a full batch is at most concurrency requests
+            self.bulk_size = -(-batch_size // self.concurrency)
+        if self.bulk_bytes is None:
+            self.bulk_bytes = batch_bytes
+
+    def flush(self):
+        attempt = 0
+        while True:
+            self.submit()
+            while self.inflight:
+                self.wait(self.inflight.popleft())
+            if not self.retrying:
+                break
+            time.sleep(self.retry_backoff * (2 ** attempt))
+            attempt += 1
+            retrying, self.retrying = self.retrying, []
+            logger.info('%s retrying %s document(s)', self.name, len(retrying))
+            for doc in retrying:
+                self.buffer(doc)
+        if self.failures:
+            failures, self.failures = self.failures, []
+            raise BulkError(failures)
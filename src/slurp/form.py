@@ -38,18 +38,31 @@ Use them like this:
 
 See `pilo <https://github.com/bninja/pilo>`_.
 """
+import calendar
+import collections
+import datetime
+import functools
+import inspect
+import re
+import threading
+
 import arrow
+import dateutil.tz
 import pilo
 
 __all__ = [
+    'compile',
+    'CompiledForm',
     'ctx',
     'Datetime',
+    'DatetimeParser',
     'Float',
     'Form',
     'Integer',
     'inline',
     'String',
     'SubForm',
+    'to_dict',
 ]
 
 NONE = pilo.NONE
@@ -70,16 +83,154 @@ class Datetime(pilo.fields.String):
 
     def __init__(self, *args, **kwargs):
         self.format = kwargs.pop('format')
+        self.parser = DatetimeParser(self.format, kwargs.pop('cache_size', 256))
         super(Datetime, self).__init__(*args, **kwargs)
 
     def _parse(self, value):
         value = self.ctx.src_path.primitive(basestring)
         try:
-            return arrow.get(value, self.format).datetime
-        except arrow.parser.ParserError, ex:
-            self.ctx.errors.invalid('{0} for "{1}"'.format(str(ex), self.format))
+            return self.convert(value)
+        except ValueError, ex:
+            self.ctx.errors.invalid(str(ex))
             return pilo.ERROR
 
+    def convert(self, value):
+        """
+        Converts a string to a `datetime.datetime`, raising `ValueError` if it
+        does not match this field's format.
+        """
+        return self.parser(value)
+
+
+class DatetimeParser(object):
+    """
+    Parses strings in an `arrow` format (e.g. "DD/MMM/YYYY:HH:mm:ss") to UTC
+    `datetime.datetime`s like `arrow.get(value, format).datetime` but:
+
+    - compiles the format once to a single regex,
+    - re-uses the previous result when only the trailing seconds differ and
+    - memoizes the `cache_size` most recently parsed strings.
+
+    Formats with tokens that are not compiled (e.g. timezones) are parsed by
+    `arrow`.
+    """
+
+    #: Compiled format tokens and their (part, pattern, convert).
+    tokens = {
+        'YYYY': ('year', r'\d{4}', int),
+        'YY': ('year', r'\d{2}', lambda v: 1900 + int(v) if int(v) > 68 else 2000 + int(v)),
+        'MMMM': ('month', '|'.join(calendar.month_name[1:]), None),
+        'MMM': ('month', '|'.join(calendar.month_abbr[1:]), None),
+        'MM': ('month', r'\d{2}', int),
+        'M': ('month', r'\d{1,2}', int),
+        'DD': ('day', r'\d{2}', int),
+        'D': ('day', r'\d{1,2}', int),
+        'HH': ('hour', r'\d{2}', int),
+        'H': ('hour', r'\d{1,2}', int),
+        'mm': ('minute', r'\d{2}', int),
+        'm': ('minute', r'\d{1,2}', int),
+        'ss': ('second', r'\d{2}', int),
+        's': ('second', r'\d{1,2}', int),
+        'SSSSSS': ('microsecond', r'\d{1,6}', int),
+        'SSSSS': ('microsecond', r'\d{1,5}', lambda v: int(v) * 10),
+        'SSSS': ('microsecond', r'\d{1,4}', lambda v: int(v) * 100),
+        'SSS': ('microsecond', r'\d{1,3}', lambda v: int(v) * 1000),
+        'SS': ('microsecond', r'\d{1,2}', lambda v: int(v) * 10000),
+        'S': ('microsecond', r'\d', lambda v: int(v) * 100000),
+    }
+
+    tzinfo = dateutil.tz.tzutc()
+
+    def __init__(self, format, cache_size=256):
+        self.format = format
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.last = None
+        self.regex, self.parts, self.tail = self._compile(format)
+
+    def _compile(self, format):
+        locale = arrow.locales.get_locale('en_us')
+        pattern, parts = [], []
+        tokens = arrow.parser.DateTimeParser._FORMAT_RE.split(format)
+        for i, token in enumerate(tokens):
+            if i % 2 == 0:
+                pattern.append(re.escape(token))
+                continue
+            if token not in self.tokens:
+                return None, None, None
+            part, token_pattern, convert = self.tokens[token]
+            if convert is None:
+                convert = locale.month_number
+            pattern.append('(?P<_{0}>{1})'.format(len(parts), token_pattern))
+            parts.append(('_{0}'.format(len(parts)), part, convert))
+        regex = re.compile(''.join(pattern))
+        tail = None
+        if parts and parts[-1][1] == 'second' and tokens[-3]:
+            # NOTE: e.g. matches "58]" of "20/Feb/2014:11:37:58]"
+            tail = re.compile(r'({0}){1}\Z'.format(
+                self.tokens[tokens[-2]][1], re.escape(tokens[-1]),
+            ))
+        return regex, parts, tail
+
+    def __call__(self, value):
+        if self.regex is None:
+            try:
+                return arrow.get(value, self.format).datetime
+            except arrow.parser.ParserError, ex:
+                raise ValueError('{0} for "{1}"'.format(str(ex), self.format))
+
+        # same as, or only seconds differ from, previous
+        last = self.last
+        if last is not None:
+            last_value, result, offset = last
+            if value == last_value:
+                return result
+            if offset is not None and value[:offset] == last_value[:offset]:
+                match = self.tail.match(value, offset)
+                if match:
+                    result = result.replace(second=int(match.group(1)))
+                    self.last = value, result, offset
+                    return result
+
+        # recently parsed
+        with self.lock:
+            parsed = self.cache.pop(value, None)
+            if parsed is not None:
+                self.cache[value] = parsed
+        if parsed is None:
+            parsed = self._parse(value)
+            with self.lock:
+                self.cache[value] = parsed
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        self.last = (value,) + parsed
+        return parsed[0]
+
+    def _parse(self, value):
+        match = self.regex.search(value)
+        if not match:
+            raise ValueError('Failed to match \'{0}\' for "{1}"'.format(
+                value, self.format,
+            ))
+        parts = {}
+        for group, part, convert in self.parts:
+            parts[part] = convert(match.group(group))
+        result = datetime.datetime(
+            year=parts.get('year', 1),
+            month=parts.get('month', 1),
+            day=parts.get('day', 1),
+            hour=parts.get('hour', 0),
+            minute=parts.get('minute', 0),
+            second=parts.get('second', 0),
+            microsecond=parts.get('microsecond', 0),
+            tzinfo=self.tzinfo,
+        )
+        offset = None
+        if self.tail is not None and match.start() == 0 and match.end() == len(value):
+            offset = match.start(self.parts[-1][0])
+        return result, offset
+
 
 String = pilo.fields.String
 
@@ -88,3 +239,373 @@ Integer = pilo.fields.Integer
 Float = pilo.fields.Float
 
 Dict = pilo.fields.Dict
+
+
+def to_dict(value):
+    """
+    Converts a, possibly nested, `Form` to plain `dict`s. Forms defined in-line
+    in configuration cannot be pickled so use this to e.g. send them between
+    processes.
+    """
+    if isinstance(value, dict):
+        return dict((k, to_dict(v)) for k, v in value.iteritems())
+    if isinstance(value, list):
+        return [to_dict(v) for v in value]
+    return value
+
+
+def compile(form_type, exclude=('exclude',)):
+    """
+    Compiles a `Form` type to a `CompiledForm` which maps flat `dict`s (e.g. a
+    regex match's `groupdict`) without going through `pilo`'s generic source,
+    path and context machinery for every field:
+
+    .. code:: python
+
+        mapper = slurp.form.compile(Form)
+        form, errors = mapper({'ip': '127.0.0.1', ...}, block=block)
+
+    `String`, `Integer`, `Float`, `Datetime` and `SubForm` (with a `None` src)
+    fields are compiled, as are `from_context`, `constant` and `capture` hooks
+    and the default, translate, ignore and built-in validation options. Fields
+    using anything else (e.g. custom compute hooks or `format`) are mapped by
+    `pilo` as usual.
+
+    :param form_type:
+        The `Form` type to compile.
+
+    :param exclude:
+        Fields with any of these tags are mapped (e.g. so computed fields can
+        refer to them) but then removed from the form, as with
+        `form.filter(*exclude, inv=True)`.
+    """
+    return CompiledForm(form_type, exclude)
+
+
+class CompiledForm(object):
+    """
+    A `Form` type compiled by `compile`.
+    """
+
+    def __init__(self, form_type, exclude=('exclude',)):
+        self.form_type = form_type
+        self.exclude = set(exclude or [])
+        self.fields = []
+        self.fallbacks = []
+        self.excluded = []
+        self.nested = []
+        #: Keys of mapped `dict`s read by this form, or None if that cannot be
+        #: determined. Computed fields are assumed to only refer to other
+        #: fields.
+        self.sources = set()
+        for field in form_type.fields:
+            mapper = _compile_field(field, self.exclude)
+            if mapper is None:
+                self.fallbacks.append(field.name)
+                mapper = _fallback_field(field)
+            elif isinstance(field, SubForm):
+                self.nested.append((field.name, mapper.compiled))
+            if self.exclude & set(field.tags):
+                self.excluded.append(field.name)
+            self.fields.append((field.name, mapper))
+            if self.sources is not None:
+                sources = _field_sources(field, mapper)
+                self.sources = None if sources is None else self.sources | sources
+
+    def __call__(self, src, **context):
+        """
+        Maps `src` to a `(form, errors)` tuple where `errors` is a list of
+        error messages, empty if `src` was mapped successfully.
+
+        :param src:
+            The `dict` to map.
+
+        :param context:
+            Values available to `from_context` fields (e.g. block).
+        """
+        errors = []
+        f = self.map(src, errors, context)
+        self._exclude(f)
+        return f, errors
+
+    def map(self, src, errors, context):
+        f = self.form_type()
+        if not self.fallbacks:
+            for name, mapper in self.fields:
+                value = mapper(src, errors, context)
+                if value is not NONE and value is not ERROR:
+                    f[name] = value
+            return f
+        pilo_src = pilo.DefaultSource(src)
+        with ctx(form=f):
+            with ctx(src=pilo_src, src_path=pilo_src.path(), errors=pilo.fields.Errors(), **context):
+                for name, mapper in self.fields:
+                    if name in f:
+                        # NOTE: already mapped by a computed field referencing it
+                        continue
+                    value = mapper(src, errors, context)
+                    if value is not NONE and value is not ERROR:
+                        f[name] = value
+        return f
+
+    def _exclude(self, f):
+        for name in self.excluded:
+            f.pop(name, None)
+        for name, compiled in self.nested:
+            if name in f:
+                compiled._exclude(f[name])
+
+
+# NOTE: hooks attached by these `pilo` helpers are recognized by their code
+def _nested_code(method):
+    for const in method.__func__.__code__.co_consts:
+        if inspect.iscode(const):
+            return const
+
+
+_FROM_CONTEXT = _nested_code(Field.from_context)
+
+_CONSTANT = _nested_code(Field.constant)
+
+_CAPTURE = _nested_code(String.capture)
+
+#: `ctx` variables set by `pilo` itself, `from_context` fields referring to
+#: these are not compiled.
+_PILO_CONTEXT = frozenset(['form', 'src', 'src_path', 'field', 'errors', 'tags'])
+
+
+def _is_hook(hook, code):
+    return hook.func is not None and hook.func.__code__ is code
+
+
+def _as_auto(value):
+    return value
+
+
+def _as_string(value):
+    if isinstance(value, basestring):
+        return value
+    raise ValueError('"{0}" is not a string'.format(value))
+
+
+def _as_int(value):
+    if isinstance(value, (int, long)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        if value.is_integer():
+            return int(value)
+    elif isinstance(value, basestring):
+        try:
+            return int(value)
+        except (ValueError, TypeError):
+            pass
+    raise ValueError('"{0}" is not an integer'.format(value))
+
+
+def _as_float(value):
+    if isinstance(value, float):
+        return value
+    if isinstance(value, (int, long)):
+        return float(value)
+    if isinstance(value, basestring):
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            pass
+    raise ValueError('"{0}" is not a float'.format(value))
+
+
+def _string_checks(field):
+    checks = []
+    if field.min_length is not None:
+        checks.append((
+            lambda value: len(value) >= field.min_length,
+            '"{0}" must have length >= {1}', field.min_length,
+        ))
+    if field.max_length is not None:
+        checks.append((
+            lambda value: len(value) <= field.max_length,
+            '"{0}" must have length <= {1}', field.max_length,
+        ))
+    if field.pattern_re:
+        checks.append((
+            lambda value: field.pattern_re.match(value),
+            '"{0}" must match pattern "{1}"', field.pattern_re.pattern,
+        ))
+    if field.choices:
+        choices = field.choices + field.translations.values()
+        if len(field.choices) == 1:
+            message, arg = '"{0}" is not "{1}"', field.choices[0]
+        else:
+            message, arg = '"{0}" is not one of {1}', ', '.join(
+                '"{0}"'.format(c) for c in field.choices
+            )
+        checks.append((lambda value: value in choices, message, arg))
+    return checks
+
+
+def _number_checks(field):
+    checks = []
+    if field.min_value is not None:
+        checks.append((
+            lambda value: value >= field.min_value,
+            '"{0}" must be >= {1}', field.min_value,
+        ))
+    if field.max_value is not None:
+        checks.append((
+            lambda value: value <= field.max_value,
+            '"{0}" must be <= {1}', field.max_value,
+        ))
+    return checks
+
+
+#: Compiled field types and their (parser, checks) factories.
+_COMPILED_TYPES = {
+    Field: (lambda field: _as_auto, lambda field: []),
+    String: (lambda field: _as_string, _string_checks),
+    Integer: (lambda field: _as_int, _number_checks),
+    Float: (lambda field: _as_float, _number_checks),
+    Datetime: (
+        lambda field: lambda value: field.convert(_as_string(value)),
+        _string_checks,
+    ),
+}
+
+
+def _compile_field(field, exclude):
+    if any([field.resolve, field.parse, field.filter, field.validate]):
+        return None
+    if type(field) is SubForm:
+        return _compile_sub_form(field, exclude)
+    if type(field) not in _COMPILED_TYPES:
+        return None
+    parser, checks = _COMPILED_TYPES[type(field)]
+    parse, checks = parser(field), checks(field)
+
+    # compute
+    if not field.compute:
+        if field.src is None:
+            return None
+        key = field.src
+
+        def compute(src, context):
+            value = src.get(key, NONE)
+            if value is NONE or value is None:
+                return value
+            return parse(value)
+
+    elif _is_hook(field.compute, _FROM_CONTEXT):
+        parts = field.src.split('.')
+        if parts[0] in _PILO_CONTEXT:
+            return None
+        head, parts = parts[0], parts[1:]
+
+        def compute(src, context):
+            try:
+                value = context[head]
+            except KeyError:
+                raise ValueError('"Frame" object has no attribute "{0}"'.format(head))
+            try:
+                return reduce(getattr, parts, value)
+            except AttributeError, ex:
+                raise ValueError(str(ex))
+
+    elif _is_hook(field.compute, _CONSTANT):
+        constant = field.compute.func
+
+        def compute(src, context):
+            return constant(None)
+
+    else:
+        return None
+
+    # munge
+    translations = field.translations
+    if not field.munge:
+        munge = None
+    elif _is_hook(field.munge, _CAPTURE):
+        munge = functools.partial(field.munge.func, field)
+    else:
+        return None
+
+    path = '' if field.src is None else field.src
+    default = field.default
+    nullable = field.nullable
+    ignores = field.ignores
+
+    def map_default(errors):
+        if default is NONE:
+            errors.append(path)
+            return ERROR
+        if isinstance(default, type):
+            return default()
+        return default
+
+    def map_field(src, errors, context):
+        try:
+            value = compute(src, context)
+            if value is NONE:
+                return map_default(errors)
+            if translations and value in translations:
+                value = translations[value]
+            if munge is not None:
+                value = munge(value)
+                if value is NONE:
+                    return map_default(errors)
+            if ignores and value in ignores:
+                return map_default(errors)
+            if value is None:
+                if not nullable:
+                    raise ValueError('not nullable')
+            else:
+                for check, message, arg in checks:
+                    if not check(value):
+                        raise ValueError(message.format(value, arg))
+        except ValueError, ex:
+            errors.append('{0} - {1}'.format(path, ex))
+            return ERROR
+        return value
+
+    return map_field
+
+
+def _compile_sub_form(field, exclude):
+    if any([field.compute, field.munge, field.translations, field.ignores]):
+        return None
+    if field.src is not None:
+        return None
+    compiled = CompiledForm(field.form_type, exclude)
+
+    def map_field(src, errors, context):
+        return compiled.map(src, errors, context)
+
+    map_field.compiled = compiled
+    return map_field
+
+
+def _field_sources(field, mapper):
+    if field.resolve:
+        return None
+    if hasattr(mapper, 'compiled'):
+        return mapper.compiled.sources
+    if field.compute:
+        return set()
+    if field.src is None:
+        if isinstance(field, SubForm):
+            return CompiledForm(field.form_type).sources
+        return None
+    return set([field.src])
+
+
+def _fallback_field(field):
+
+    def map_field(src, errors, context):
+        with ctx(field=field, errors=pilo.fields.Errors()):
+            try:
+                field.__get__(ctx.form, type(ctx.form))
+            except pilo.FieldError:
+                pass
+            errors.extend(str(error) for error in ctx.errors)
+        return NONE
+
+    return map_field
@@ -0,0 +1,262 @@
+"""
+A sparse, persistent index of `Block` offsets within a file. Every Nth block
+begin offset (i.e. the first block of an index "page") is recorded along with
+that block's timestamp, if its source has one, while the file is consumed.
+Offsets are then looked up to position a file exactly on a block boundary
+without rescanning (and, for multi-line blocks, guessing at) where blocks
+begin:
+
+.. code::
+
+    import slurp
+
+    index = slurp.BlockIndex('/var/log/app.log', '/var/lib/slurp/app.index/...')
+    with open('/var/log/app.log', 'r') as fo:
+        for batch in slurp.Blocks(fo).batches():
+            index.update(batch)
+    index.close()
+
+    print index.floor(123456)
+
+Indexes are append-only text files with a JSON header line identifying the
+indexed file followed by one "offset timestamp" line per page. Only one
+`BlockIndex` appends to a file at a time, others are not persisted while it
+holds the file's lock, and offsets that do not increase are discarded.
+"""
+import array
+import bisect
+import calendar
+import datetime
+import errno
+import hashlib
+import json
+import logging
+import os
+
+from .block import OFFSET_TYPE
+from . import compress
+
+
+__all__ = [
+    'BlockIndex',
+    'timestamp',
+]
+
+logger = logging.getLogger(__name__)
+
+
+def timestamp(value):
+    """
+    Converts a form timestamp field value to seconds since the epoch or None if
+    it cannot be.
+    """
+    if isinstance(value, datetime.datetime):
+        return calendar.timegm(value.utctimetuple()) + value.microsecond / 1e6
+    if isinstance(value, (int, long, float)):
+        return float(value)
+    if isinstance(value, basestring):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return None
+
+
+class BlockIndex(object):
+    """
+    Sparse index of block begin offsets, and optionally timestamps, for a file.
+    """
+
+    def __init__(self, path, index_path=None, interval=1024):
+        """
+        :param path:
+            Path of the indexed file.
+
+        :param index_path:
+            Path of the file the index is persisted to or None to only keep it
+            in memory.
+
+        :param interval:
+            Number of blocks per index page.
+        """
+        self.path = path
+        self.index_path = index_path
+        self.interval = interval
+        self.offsets = array.array(OFFSET_TYPE)
+        self.timestamps = []
+        self.count = 0
+        self._fo = None
+        self._locked = None
+        self._load()
+        self.stat = self._stat()
+
+    @classmethod
+    def for_path(cls, path, index_dir, interval=1024):
+        """
+        Creates an index for `path` persisted to a file in `index_dir`.
+        """
+        index_path = os.path.join(index_dir, hashlib.sha1(path).hexdigest())
+        return cls(path, index_path, interval)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def _stat(self):
+        stats = []
+        for path in (self.index_path, self.path):
+            try:
+                st = os.stat(path) if path else None
+            except OSError:
+                st = None
+            stats.append(st and (st.st_ino, st.st_size, st.st_mtime))
+        return stats[0], stats[1] and stats[1][0]
+
+    def stale(self):
+        """
+        Determines whether the index file has changed, or the indexed file
+        been replaced, since this index last loaded or appended to it.
+        """
+        return self._stat() != self.stat
+
+    def _header(self):
+        return {'path': self.path, 'inode': os.stat(self.path).st_ino}
+
+    def _load(self):
+        if not self.index_path or not os.path.isfile(self.index_path):
+            return
+        with open(self.index_path, 'r') as fo:
+            line = fo.readline()
+            if not line:
+                # NOTE: created by a writer that has not written its header yet
+                return
+            try:
+                header = json.loads(line)
+                offsets, timestamps = array.array(OFFSET_TYPE), []
+                for line in fo:
+                    if not line.endswith('\n'):
+                        # NOTE: partial write
+                        break
+                    offset, ts = line.split()
+                    offset = int(offset)
+                    if offsets and offset <= offsets[-1]:
+                        continue
+                    offsets.append(offset)
+                    timestamps.append(None if ts == '-' else float(ts))
+            except ValueError, ex:
+                logger.warning('"%s" index is corrupt - %s', self.index_path, ex)
+                header = None
+        if not self._valid(header, offsets):
+            logger.info('"%s" index "%s" is stale, discarding', self.path, self.index_path)
+            os.remove(self.index_path)
+            return
+        self.offsets, self.timestamps = offsets, timestamps
+        logger.debug(
+            '"%s" loaded %s index entries from "%s"',
+            self.path, len(self.offsets), self.index_path,
+        )
+
+    def _valid(self, header, offsets):
+        if header != self._header():
+            return False
+        # NOTE: offsets are uncompressed so cannot be compared to the file size
+        if offsets and not compress.codec(self.path):
+            if offsets[-1] > os.path.getsize(self.path):
+                return False
+        return True
+
+    def _lock(self):
+        """
+        Opens, and locks, the index file for appending unless another
+        `BlockIndex` has it locked. Entries appended by previous writers are
+        loaded first.
+
+        :return: True if this index can append to the file.
+        """
+        import fcntl
+
+        if self._locked is not None:
+            return self._locked
+        index_dir = os.path.dirname(self.index_path)
+        if not os.path.isdir(index_dir):
+            os.makedirs(index_dir)
+        fo = open(self.index_path, 'a')
+        try:
+            fcntl.flock(fo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError, ex:
+            fo.close()
+            if ex.errno not in (errno.EACCES, errno.EAGAIN):
+                raise
+            logger.debug(
+                '"%s" index "%s" is locked, not persisting', self.path, self.index_path,
+            )
+            self._locked = False
+            return False
+        fo.seek(0, os.SEEK_END)
+        if fo.tell():
+            self._load()
+            if not os.path.exists(self.index_path):
+                # NOTE: discarded as stale
+                fo.close()
+                fo = open(self.index_path, 'a')
+                fcntl.flock(fo.fileno(), fcntl.LOCK_EX)
+        self._fo, self._locked = fo, True
+        return True
+
+    def _append(self, offset, ts):
+        if self.index_path:
+            self._lock()
+        if self.offsets and offset <= self.offsets[-1]:
+            return
+        self.offsets.append(offset)
+        self.timestamps.append(ts)
+        if self._fo is None:
+            return
+        self._fo.seek(0, os.SEEK_END)
+        if not self._fo.tell():
+            self._fo.write(json.dumps(self._header()) + '\n')
+        self._fo.write('{0} {1}\n'.format(offset, '-' if ts is None else repr(ts)))
+        self._fo.flush()
+        self.stat = self._stat()
+
+    def update(self, batch, timestamp=None):
+        """
+        Indexes a `BlockBatch`.
+
+        :param batch:
+            The `BlockBatch`. Blocks at or before the last indexed offset are
+            ignored.
+
+        :param timestamp:
+            Optional callable used to determine the timestamp, as seconds since
+            the epoch, of a page's first `Block`.
+        """
+        begins = batch.begins
+        i = 0
+        if self.offsets:
+            i = bisect.bisect_right(begins, self.offsets[-1])
+        while i < len(begins):
+            if self.offsets:
+                skip = self.interval - self.count - 1
+                if i + skip >= len(begins):
+                    self.count += len(begins) - i
+                    break
+                i += skip
+            self._append(begins[i], timestamp(batch[i]) if timestamp else None)
+            self.count = 0
+            i += 1
+
+    def floor(self, offset):
+        """
+        The (offset, timestamp) of the last indexed block that begins at or
+        before `offset` or None if there is none.
+        """
+        i = bisect.bisect_right(self.offsets, offset)
+        if not i:
+            return None
+        return self.offsets[i - 1], self.timestamps[i - 1]
+
+    def close(self):
+        if self._fo is not None:
+            self._fo.close()
+            self._fo = None
+        self._locked = None
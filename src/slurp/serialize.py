@@ -0,0 +1,270 @@
+"""
+Serializes forms to JSON for sinks in a single pass:
+
+.. code::
+
+    import slurp
+
+    print slurp.serialize.dumps(form)
+
+Unlike ``json.dumps(form, default=...)``:
+
+- form fields are written in their declared order, which is computed once per
+  `Form` type,
+- `datetime.datetime` and `datetime.date` values are written like
+  ``isoformat()`` without calling it for each value and
+- strings are escaped by the fastest available backend (see `BACKENDS`).
+
+Output is always ASCII encoded `str`. Values can be `Form`s, `dict`s, `list`s,
+`tuple`s, strings, numbers, booleans, None, datetimes and dates. Anything else
+raises `TypeError` unless an `Encoder` is given a `default` to convert it and
+`str`s that are not UTF-8 raise `UnicodeDecodeError` unless it is given lenient
+decoding `errors`.
+"""
+import datetime
+import logging
+import threading
+
+import pilo
+
+
+__all__ = [
+    'BACKENDS',
+    'backend',
+    'DatetimeFormatter',
+    'dumps',
+    'Encoder',
+]
+
+logger = logging.getLogger(__name__)
+
+
+def _ujson():
+    import ujson
+
+    def escape(value):
+        return ujson.dumps(value, escape_forward_slashes=False)
+
+    return escape
+
+
+def _simplejson():
+    from simplejson.encoder import encode_basestring_ascii
+    return encode_basestring_ascii
+
+
+def _json():
+    from json.encoder import encode_basestring_ascii
+    return encode_basestring_ascii
+
+
+#: JSON backends as (name, string escaper factory), fastest first.
+BACKENDS = [
+    ('ujson', _ujson),
+    ('simplejson', _simplejson),
+    ('json', _json),
+]
+
+
+def backend(name=None):
+    """
+    Returns the (name, string escaper) of a backend.
+
+    :param name:
+        Name of the backend to use. If None then the first one that can be
+        imported is used.
+    """
+    for backend_name, factory in BACKENDS:
+        if name is not None and backend_name != name:
+            continue
+        try:
+            return backend_name, factory()
+        except ImportError:
+            if name is not None:
+                raise
+    raise ValueError('No JSON backend named "{0}"'.format(name))
+
+
+class DatetimeFormatter(object):
+    """
+    Formats `datetime.datetime`s as JSON strings like ``isoformat()`` does and
+    re-uses the previous result for the same value. Note that `form.Datetime`
+    returns the same `datetime.datetime` for repeated timestamps, which are
+    common in e.g. access logs.
+    """
+
+    def __init__(self):
+        self.last = None
+
+    def __call__(self, value):
+        last = self.last
+        # NOTE: identity, equal datetimes in different timezones format differently
+        if last is not None and last[0] is value:
+            return last[1]
+        result = '"%04d-%02d-%02dT%02d:%02d:%02d' % (
+            value.year, value.month, value.day,
+            value.hour, value.minute, value.second,
+        )
+        if value.microsecond:
+            result += '.%06d' % value.microsecond
+        offset = value.utcoffset()
+        if offset is not None:
+            minutes = offset.days * 1440 + offset.seconds // 60
+            sign = '-' if minutes < 0 else '+'
+            result += '%s%02d:%02d' % ((sign,) + divmod(abs(minutes), 60))
+        result += '"'
+        self.last = value, result
+        return result
+
+
+def _date(value):
+    return '"%04d-%02d-%02d"' % (value.year, value.month, value.day)
+
+
+def _float(value):
+    if value != value:
+        return 'NaN'
+    if value == float('inf'):
+        return 'Infinity'
+    if value == float('-inf'):
+        return '-Infinity'
+    return repr(value)
+
+
+_MISSING = object()
+
+
+class Encoder(object):
+    """
+    Encodes values to JSON. Encoders for each type, including a compiled one
+    for each `Form` type, are resolved once and cached.
+    """
+
+    def __init__(self, backend_name=None, default=None, errors='strict'):
+        """
+        :param backend_name:
+            Name of the backend (see `BACKENDS`) used to escape strings. If
+            None then the fastest available one is used.
+
+        :param default:
+            Called to convert values that cannot be encoded, should return an
+            encodable value or raise `TypeError`.
+
+        :param errors:
+            How `str`s that are not UTF-8 are decoded, e.g. "replace", as for
+            `str.decode`. Defaults to "strict".
+        """
+        self.backend, self.escape = backend(backend_name)
+        self.default = default
+        self.errors = errors
+        self.string = self.escape if errors == 'strict' else self._string
+        self.lock = threading.Lock()
+        self.encoders = {
+            str: self.string,
+            unicode: self.string,
+            bool: lambda value: 'true' if value else 'false',
+            int: str,
+            long: str,
+            float: _float,
+            type(None): lambda value: 'null',
+            datetime.datetime: DatetimeFormatter(),
+            datetime.date: _date,
+            dict: self._dict,
+            list: self._list,
+            tuple: self._list,
+        }
+
+    def __call__(self, value):
+        """
+        Encodes `value` to a JSON `str`.
+        """
+        return self._value(value)
+
+    def _value(self, value):
+        encode = self.encoders.get(type(value))
+        if encode is None:
+            encode = self._resolve(type(value))
+            if encode is None:
+                return self._default(value)
+        return encode(value)
+
+    def _resolve(self, value_type):
+        if issubclass(value_type, pilo.Form):
+            encode = self._compile(value_type)
+        else:
+            for base in value_type.__mro__[1:]:
+                encode = self.encoders.get(base)
+                if encode is not None:
+                    break
+            else:
+                return None
+        with self.lock:
+            self.encoders[value_type] = encode
+        return encode
+
+    def _string(self, value):
+        try:
+            return self.escape(value)
+        except ValueError:
+            # NOTE: backends raise UnicodeDecodeError, or ValueError, on
+            # non-UTF-8 bytes
+            if not isinstance(value, str):
+                raise
+            return self.escape(value.decode('utf-8', self.errors))
+
+    def _default(self, value):
+        if self.default is None:
+            raise TypeError('{0!r} is not JSON serializable'.format(value))
+        return self._value(self.default(value))
+
+    def _key(self, key):
+        if isinstance(key, basestring):
+            return self.string(key) + ':'
+        if key is None or isinstance(key, (bool, int, long, float)):
+            return self.escape(self._value(key)) + ':'
+        raise TypeError('key {0!r} is not a string'.format(key))
+
+    def _dict(self, value):
+        key, get, encode = self._key, self.encoders.get, self._value
+        parts = []
+        for k, v in value.iteritems():
+            e = get(type(v), encode)
+            parts.append(key(k) + e(v))
+        return '{' + ','.join(parts) + '}'
+
+    def _list(self, value):
+        get, encode = self.encoders.get, self._value
+        return '[' + ','.join([get(type(v), encode)(v) for v in value]) + ']'
+
+    def _compile(self, form_type):
+        logger.debug('compiling encoder for %s', form_type.__name__)
+        keys = [(field.name, self._key(field.name)) for field in form_type.fields]
+        names = set(name for name, _ in keys)
+        key, get, encode = self._key, self.encoders.get, self._value
+        dict_get = dict.get
+
+        def encode_form(value):
+            parts = []
+            for name, prefix in keys:
+                v = dict_get(value, name, _MISSING)
+                if v is not _MISSING:
+                    parts.append(prefix + get(type(v), encode)(v))
+            if len(parts) < len(value):
+                # NOTE: keys without a field (e.g. assigned directly)
+                for name, v in value.iteritems():
+                    if name not in names:
+                        parts.append(key(name) + encode(v))
+            return '{' + ','.join(parts) + '}'
+
+        return encode_form
+
+
+#: Shared `Encoder` using the fastest available backend.
+encoder = Encoder()
+
+
+def dumps(value):
+    """
+    Encodes `value` to a JSON `str` using the shared `Encoder`.
+    """
+    return encoder(value)
@@ -206,6 +206,10 @@ class Source(pilo.source.ConfigSource):
 
     def as_raw(self, path):
         option = path[-1]
+        if len(path) == 2:
+            # NOTE: mapping option, e.g. patterns[name]
+            option = '{0}[{1}]'.format(path[0], path[1])
+        option_re = re.compile(r'{0}\s*[=:]'.format(re.escape(option)), re.IGNORECASE)
         lines = []
         with open(self.location, 'r') as fo:
             section_header = '[{0}]'.format(self.section)
@@ -213,7 +217,7 @@ class Source(pilo.source.ConfigSource):
                 if line.strip() == section_header:
                     break
             for line in fo:
-                if line.strip().startswith(option):
+                if option_re.match(line.strip()):
                     break
             for line in fo:
                 if line and not line[0].isspace():
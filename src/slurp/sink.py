@@ -60,9 +60,9 @@ and register it as an extension (i.e. put it in /etc/slurp/conf.d/). Of course
 these can be embedded in configuration files directly if you prefer.
 
 """
-from pprint import pprint
+import sys
 
-from . import settings, Settings
+from . import serialize, settings, Settings
 
 
 class Sink(object):
@@ -110,6 +110,19 @@ class Sink(object):
         """
         pass
 
+    def limits(self, batch_size=None, batch_bytes=None):
+        """
+        Called by a `Channel` with the maximum number of blocks, and of block
+        bytes, it will send to this sink between flushes. Buffering sinks can
+        use these to size their requests.
+
+        :param batch_size:
+            Maximum number of pending blocks or None.
+        :param batch_bytes:
+            Maximum number of pending block bytes or None.
+        """
+        pass
+
 
 class SinkSettings(Settings):
 
@@ -117,9 +130,23 @@ class SinkSettings(Settings):
 
 
 class Echo(Sink):
+    """
+    Writes forms as lines of JSON (see `serialize`). Values that cannot be
+    encoded are written as their `repr` and bytes that are not UTF-8 are
+    replaced so echoing a valid form never fails.
+    """
+
+    def __init__(self, name, stream=None):
+        """
+        :param name: A unique name for the sink.
+        :param stream: File-like object to write to, defaults to stdout.
+        """
+        super(Echo, self).__init__(name)
+        self.stream = stream
+        self.encoder = serialize.Encoder(default=repr, errors='replace')
 
     def __call__(self, form, block):
-        pprint(form)
+        (self.stream or sys.stdout).write(self.encoder(form) + '\n')
 
 
 class Drop(Sink):
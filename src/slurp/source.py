@@ -65,11 +65,21 @@ and now you can use it like:
     pprint(list(source.forms(fo)))
 
 """
+import bisect
+import collections
 import fnmatch
+import itertools
 import logging
+import multiprocessing
+import os
 import re
+import sre_constants
+import sre_parse
+import sys
 
-from . import settings, Settings, form, Form, Blocks
+from . import settings, Settings, form, Form, Block, Blocks, BlockBatch
+from .form import CompiledForm
+from .index import BlockIndex, timestamp
 
 
 logger = logging.getLogger(__name__)
@@ -84,11 +94,30 @@ class SourceSettings(Settings):
     #: Regex string. Note that regex strings are treated as verbose
     #: (http:/docs.python.org/2/library/re.html#re.X) and prefixed blocks will
     #: match newlines (http://docs.python.org/2/library/re.html#re.DOTALL).
-    pattern = settings.String()
+    pattern = settings.String(default=None)
 
     @pattern.parse
     def pattern(self, path):
-        value = path.primitive(basestring)
+        return self._compile(path.primitive(basestring))
+
+    #: Named regex strings, e.g. `patterns[combined] = ...`, used instead of
+    #: `pattern` for files with several block formats. Blocks are matched
+    #: against them in order of how often each has matched and the name of the
+    #: one that does is available to forms as context "pattern".
+    patterns = settings.Dict(settings.String(), settings.String(), default=None)
+
+    @patterns.munge
+    def patterns(self, value):
+        if value is None:
+            return value
+        compiled = {}
+        for name, pattern in value.iteritems():
+            compiled[name] = self._compile(pattern)
+            if compiled[name] is form.ERROR:
+                return form.ERROR
+        return compiled
+
+    def _compile(self, value):
         flags = re.VERBOSE
         if self.prefix:
             flags |= re.DOTALL
@@ -98,6 +127,11 @@ class SourceSettings(Settings):
             self.ctx.errors.invalid(str(ex))
             return form.ERROR
 
+    #: Literal strings that must all be in a block for it to match `pattern`.
+    #: Blocks without them are rejected without evaluating `pattern`. If None
+    #: they are derived from `pattern` and if empty there is no pre-filter.
+    prefilter = settings.List(settings.String(), default=None)
+
     #: A module:attribute string or in-line code block that resolve to a
     #: call-able with this signature:
     #:
@@ -110,6 +144,34 @@ class SourceSettings(Settings):
     #: discarded.
     filter = settings.Code(default=None).as_callable(lambda form, block: None)
 
+    #: Names of the pattern groups `filter` reads. If set `filter` is called
+    #: with a read-only mapping of just those groups' raw string values as
+    #: its "form" *before* the block is mapped by `form`, so rejected blocks
+    #: are never mapped.
+    filter_fields = settings.List(settings.String(), default=None)
+
+    #: A module:attribute string or in-line code block that resolves to a
+    #: call-able with this signature:
+    #:
+    #: ..code::
+    #:
+    #:      def raw_filter(block):
+    #:          return True
+    #:
+    #: It is called with each `Block`, whose `raw` is a `str`, before it is
+    #: matched against `pattern`. If the call-able returns True the block is
+    #: processed otherwise it is discarded.
+    raw_filter = settings.Code(default=None).as_callable(lambda block: None)
+
+    #: Regex strings, searched for in blocks before they are matched against
+    #: `pattern`. Blocks not containing any of them are discarded.
+    raw_include = settings.List(settings.String(), default=None)
+
+    #: Regex strings, e.g. `GET /health`, searched for in blocks before they
+    #: are matched against `pattern`. Blocks containing any of them are
+    #: discarded.
+    raw_exclude = settings.List(settings.String(), default=None)
+
     #: A module:attribute string or in-line code that resolves to a
     #: :class:`Form`. This is used to map blocks.
     form = settings.Code(default=None).as_class(Form)
@@ -141,6 +203,14 @@ class SourceSettings(Settings):
             return False
         return True
 
+    #: Name of the form field holding a block's timestamp. It should be a
+    #: `form.Datetime`.
+    timestamp = settings.String(default=None)
+
+    #: Number of blocks per page of a file's block index, which is kept in
+    #: the state directory. If None files are not indexed.
+    index_interval = settings.Integer(default=None).min(1)
+
 
 class Source(object):
     """
@@ -148,10 +218,14 @@ class Source(object):
     those files into something structured (e.g. a dict).
     """
 
+    #: Number of matches after which multiple patterns are re-ordered by how
+    #: often each has matched.
+    reorder_interval = 1024
+
     def __init__(self,
             name,
             globs,
-            pattern,
+            pattern=None,
             form=None,
             filter=None,
             terminal='\n',
@@ -159,6 +233,15 @@ class Source(object):
             strict=False,
             read_size=1024,
             buffer_size=1048576,
+            timestamp=None,
+            index_interval=None,
+            state_dir=None,
+            prefilter=None,
+            patterns=None,
+            filter_fields=None,
+            raw_filter=None,
+            raw_include=None,
+            raw_exclude=None,
         ):
         self.name = name
         self.globs = []
@@ -169,15 +252,45 @@ class Source(object):
                 glob = re.compile(fnmatch.translate(glob))
             self.globs.append(glob)
         self.form = form
+        self.mapper = CompiledForm(form) if form else None
         self.filter = filter
-        if isinstance(pattern, basestring):
-            pattern = re.compile(pattern)
-        self.pattern = pattern
+        self.filter_fields = filter_fields
+        if patterns:
+            if pattern is not None:
+                raise ValueError('{0} cannot have both pattern and patterns'.format(name))
+            pattern = patterns
+        if pattern is None:
+            raise ValueError('{0} has no pattern'.format(name))
+        if isinstance(pattern, dict):
+            pattern = sorted(pattern.iteritems())
+        elif isinstance(pattern, (list, tuple)):
+            pattern = list(enumerate(pattern))
+        else:
+            pattern = [(None, pattern)]
+        fields = self.mapper.sources if self.mapper else None
+        self.patterns = [
+            SourcePattern(n, p, derive=prefilter is None, fields=fields)
+            for n, p in pattern
+        ]
+        self.pattern = self.patterns[0].regex
+        self.prefilter = [
+            re.compile(re.escape(literal)) for literal in prefilter or []
+        ]
+        self.raw_filter = raw_filter
+        self.raw_include = _any(raw_include)
+        self.raw_exclude = _any(raw_exclude)
+        self.raw_rejects = 0
+        self.prefilter_rejects = 0
+        self.matches = 0
         self.prefix = prefix
         self.terminal = terminal
         self.strict = strict
         self.read_size = read_size
         self.buffer_size = buffer_size
+        self.timestamp = timestamp
+        self.index_interval = index_interval
+        self.state_dir = state_dir
+        self.indexes = {}
 
     def blocks(self, fo):
         """
@@ -196,42 +309,395 @@ class Source(object):
         """
         Generator for blocks extracted from a file-like object.
         """
-        path = getattr(fo, 'name', '<memory>')
-        for block in self.blocks(fo):
-            match = self.pattern.match(block.raw)
+        for forms in self.batches(fo):
+            for f, block in forms:
+                yield f, block
+
+    def batches(self, fo, max_blocks=1024, max_bytes=None, index=True):
+        """
+        Generator for lists of (form, block) tuples extracted from each
+        `BlockBatch` read from a file-like object. If extraction fails part way
+        through a batch the forms extracted up to that point are generated
+        before the error is raised.
+
+        If `index` is False the file's `BlockIndex`, if any, is not updated
+        (e.g. when only part of the file is parsed).
+        """
+        for _, forms, exc_info in self._batches(
+                fo, self._forms, max_blocks, max_bytes, index=index,
+            ):
+            if forms:
+                yield forms
+            if exc_info:
+                raise exc_info[0], exc_info[1], exc_info[2]
+
+    def _batches(self, fo, extract, max_blocks=1024, max_bytes=None, index=True):
+        """
+        Generator for (`BlockBatch`, forms, exc_info) tuples where forms are
+        those `extract`ed from the batch up to the error, if any, described by
+        exc_info.
+        """
+        block_index = self.index(fo) if index else None
+        try:
+            for batch in self.blocks(fo).batches(max_blocks, max_bytes):
+                if block_index is not None:
+                    block_index.update(batch, self.block_timestamp)
+                forms, exc_info = [], None
+                try:
+                    for f in extract(batch):
+                        forms.append(f)
+                except Exception:
+                    exc_info = sys.exc_info()
+                yield batch, forms, exc_info
+        finally:
+            if block_index is not None:
+                block_index.close()
+
+    def parallel_batches(self, fo, jobs, chunk_size=16777216):
+        """
+        Generator for lists of (form, block) tuples extracted from a regular
+        file by a pool of `jobs` processes. The remainder of the file is split
+        into block aligned ranges of about `chunk_size` bytes which are parsed
+        in parallel and generated in offset order.
+
+        Forms are generated as plain `dict`s (see `form.to_dict`) since they
+        are pickled back from pool processes, which do not update the file's
+        `BlockIndex`.
+        """
+        path = fo.name
+        blocks = self.blocks(fo)
+        begin = fo.tell()
+        end = os.fstat(fo.fileno()).st_size
+        count = max(jobs, (end - begin) // chunk_size + 1)
+        offsets = [begin]
+        for i in xrange(1, count):
+            offset = blocks.align(begin + (end - begin) * i // count)
+            if offset > offsets[-1]:
+                offsets.append(offset)
+        offsets.append(end)
+        ranges = [
+            (path, b, e) for b, e in zip(offsets[:-1], offsets[1:]) if b < e
+        ]
+        logger.info(
+            '%s "%s"[%s:%s] parsing %s range(s) with %s job(s)',
+            self.name, path, begin, end, len(ranges), jobs
+        )
+        pool = multiprocessing.Pool(
+            jobs, initializer=_parallel_init, initargs=(self,)
+        )
+        try:
+            results = collections.deque()
+            ranges = iter(ranges)
+            while True:
+                for r in ranges:
+                    results.append(pool.apply_async(_parallel_forms, (r,)))
+                    if len(results) >= 2 * jobs:
+                        break
+                if not results:
+                    break
+                forms = results.popleft().get()
+                if forms:
+                    fo.seek(forms[-1][1].end, os.SEEK_SET)
+                    yield forms
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def pooled_batches(self, fo, pool, jobs, max_blocks=1024, max_bytes=None):
+        """
+        Generator for lists of (form, block) tuples extracted from each
+        `BlockBatch` read from a file-like object by a pool of `jobs`
+        processes. Blocks are read here and batches are mapped by the pool,
+        up to 2 * `jobs` ahead of the one being generated.
+
+        The pool must have been created by `parse_pool` for this source and
+        forms are generated as plain `dict`s (see `form.to_dict`). Counters
+        (e.g. `matches`) are kept by the pool processes, not this source.
+        """
+        block_index = self.index(fo)
+        pending = collections.deque()
+        batches = self.blocks(fo).batches(max_blocks, max_bytes)
+        try:
+            while True:
+                for batch in batches:
+                    if block_index is not None:
+                        block_index.update(batch, self.block_timestamp)
+                    args = (
+                        self.name, batch.path, batch.buf, batch.base,
+                        batch.begins, batch.ends,
+                    )
+                    pending.append((batch, pool.apply_async(_pooled_forms, (args,))))
+                    if len(pending) >= 2 * jobs:
+                        break
+                if not pending:
+                    break
+                batch, result = pending.popleft()
+                results, ex = result.get()
+                forms = [
+                    (f, batch[bisect.bisect_left(batch.begins, begin)])
+                    for f, begin in results
+                ]
+                if forms:
+                    yield forms
+                if ex is not None:
+                    raise ex
+        finally:
+            if block_index is not None:
+                block_index.close()
+
+    def index(self, fo):
+        """
+        The `BlockIndex` for a file-like object or None if it cannot be
+        indexed (e.g. indexing is disabled or it is not a file). Indexes are
+        cached per path and only re-loaded once their file changes.
+        """
+        if not self.index_interval or not self.state_dir:
+            return None
+        path = getattr(fo, 'name', None)
+        if not isinstance(path, basestring) or not os.path.isfile(path):
+            return None
+        path = os.path.abspath(path)
+        block_index = self.indexes.get(path)
+        if block_index is None or block_index.stale():
+            block_index = BlockIndex.for_path(
+                path,
+                os.path.join(self.state_dir, self.name + '.index'),
+                self.index_interval,
+            )
+            self.indexes[path] = block_index
+        return block_index
+
+    def parse(self, block):
+        """
+        Extracts the form from a single block or None if it does not match.
+        Filters are not applied and errors are not raised.
+        """
+        for pattern in self.patterns:
+            match = pattern.regex.match(block.raw)
+            if match:
+                break
+        else:
+            return None
+        f = dict(
+            (k, str(v)) for k, v in match.groupdict().iteritems() if v is not None
+        )
+        if self.form:
+            with form.ctx(block=block, pattern=pattern.name):
+                src = f
+                f = self.form()
+                if f(src):
+                    return None
+        return f
+
+    def block_timestamp(self, block):
+        """
+        Extracts the timestamp of a block as seconds since the epoch or None if
+        it cannot be.
+        """
+        if not self.timestamp:
+            return None
+        f = self.parse(block)
+        if f is None:
+            return None
+        return timestamp(f.get(self.timestamp))
+
+    def align(self, fo, offset):
+        """
+        Positions a seekable file-like object at the first block that begins
+        at or after `offset`. The file's `BlockIndex`, if any, is used to find a
+        preceding block boundary to scan from, otherwise the boundary is found
+        by `Blocks.align`.
+
+        :return: The aligned offset.
+        """
+        block_index = self.index(fo)
+        entry = block_index.floor(offset) if block_index is not None else None
+        if entry is None:
+            offset = self.blocks(fo).align(offset)
+        elif entry[0] != offset:
+            fo.seek(entry[0], os.SEEK_SET)
+            for block in self.blocks(fo):
+                if block.begin >= offset:
+                    offset = block.begin
+                    break
+            else:
+                fo.seek(0, os.SEEK_END)
+                offset = fo.tell()
+        fo.seek(offset, os.SEEK_SET)
+        logger.debug(
+            '%s "%s" aligned @ %s from index entry %s',
+            self.name, getattr(fo, 'name', '<memory>'), offset, entry,
+        )
+        return offset
+
+    def search(self, fo, value):
+        """
+        Positions a seekable file-like object at the first block with a
+        timestamp at or after `value`, assuming block timestamps are ordered.
+        The file is binary searched by aligning to a block and parsing just
+        that block's timestamp so only ~log2(size) blocks are parsed. Timestamps
+        from the file's `BlockIndex`, if any, are used to narrow the search.
+
+        :param value:
+            Timestamp as a `datetime` or seconds since the epoch.
+
+        :return: The offset of that block or the end of the file if there is
+                 none.
+        """
+        if not self.timestamp:
+            raise ValueError('{0} has no timestamp field'.format(self.name))
+        value = timestamp(value)
+        fo.seek(0, os.SEEK_END)
+        lo, hi = 0, fo.tell()
+        block_index = self.index(fo)
+        if block_index is not None:
+            for offset, ts in zip(block_index.offsets, block_index.timestamps):
+                if ts is None:
+                    continue
+                if ts < value:
+                    lo = offset
+                else:
+                    hi = offset
+                    break
+        probes = 0
+        while lo < hi:
+            mid = (lo + hi) // 2
+            fo.seek(self.blocks(fo).align(mid), os.SEEK_SET)
+            block, ts = None, None
+            for candidate in self.blocks(fo):
+                if candidate.begin >= hi:
+                    break
+                probes += 1
+                ts = self.block_timestamp(candidate)
+                if ts is not None:
+                    block = candidate
+                    break
+            if block is None:
+                hi = mid
+            elif ts < value:
+                lo = block.end
+            else:
+                hi = block.begin
+        fo.seek(lo, os.SEEK_SET)
+        logger.debug(
+            '%s "%s" found %s @ %s after parsing %s block(s)',
+            self.name, getattr(fo, 'name', '<memory>'), value, lo, probes,
+        )
+        return lo
+
+    def _forms(self, batch):
+        path = batch.path
+        strict = self.strict
+        prefilter = self.prefilter if not strict else None
+        patterns = self.patterns
+        match_filters = self._match_filters()
+        raw_filter = self.raw_filter
+        raw_include = self.raw_include
+        raw_exclude = self.raw_exclude
+        for i in xrange(len(batch)):
+            # NOTE: match each block on its own so anchors and lookarounds
+            # cannot see neighbouring blocks in the batch's buffer
+            raw = batch.raw(i)
+            block = None
+            if (raw_include is not None and not raw_include.search(raw) or
+                raw_exclude is not None and raw_exclude.search(raw)):
+                self.raw_rejects += 1
+                continue
+            if raw_filter is not None:
+                block = Block(path, batch.begins[i], batch.ends[i], raw)
+                if not raw_filter(block):
+                    self.raw_rejects += 1
+                    continue
+            if prefilter:
+                for literal in prefilter:
+                    if not literal.search(raw):
+                        break
+                else:
+                    literal = None
+                if literal is not None:
+                    self.prefilter_rejects += 1
+                    continue
+            match, tried = None, 0
+            for pattern in patterns:
+                if pattern.literals and not strict:
+                    if not pattern.admits(raw):
+                        self.prefilter_rejects += 1
+                        continue
+                tried += 1
+                match = pattern.regex.match(raw)
+                if match:
+                    pattern.hits += 1
+                    break
             if not match:
-                if self.strict:
+                if not tried:
+                    continue
+                if strict:
                     raise ValueError(
                         '{0} {1} @ {2} - does not match pattern {3}'.format(
-                             self.name, path, block, self.pattern.pattern
+                             self.name, path, batch[i], self._describe()
                     ))
                 logger.info(
                     '%s %s @ %s - does not match pattern "%s"',
-                    self.name, path, block, self.pattern.pattern
+                    self.name, path, batch[i], self._describe()
                 )
                 continue
-            f = dict(
-                (k, str(v)) for k, v in match.groupdict().iteritems() if v is not None
-            )
-            if self.form:
-                with form.ctx(block=block):
-                    src = f
-                    f = self.form()
-                    errors = f(src)
-                    if errors:
-                        if self.strict:
-                            raise ValueError('{0} {1} @ {2} - {3}'.format(
-                                self.name, path, block, errors[0]
-                            ))
-                        logger.info(
-                            '%s %s @ %s - %s', self.name, path, block, errors[0]
-                        )
-                        continue
-                    f = f.filter('exclude', inv=True)
-            if self.filter and not self.filter(f, block):
+            self.matches += 1
+            if self.matches >= self.reorder_interval:
+                self._reorder()
+            if block is None:
+                block = Block(path, batch.begins[i], batch.ends[i], raw)
+            if match_filters:
+                for match_filter, fields in match_filters:
+                    if not match_filter(MatchGroups(match, fields), block):
+                        break
+                else:
+                    match_filter = None
+                if match_filter is not None:
+                    continue
+            f = pattern.extract(match)
+            if self.mapper:
+                f, errors = self.mapper(f, block=block, pattern=pattern.name)
+                if errors:
+                    if self.strict:
+                        raise ValueError('{0} {1} @ {2} - {3}'.format(
+                            self.name, path, block, errors[0]
+                        ))
+                    logger.info(
+                        '%s %s @ %s - %s', self.name, path, block, errors[0]
+                    )
+                    continue
+            if self.filter and self.filter_fields is None and not self.filter(f, block):
                 continue
             yield f, block
 
+    def _match_filters(self):
+        """
+        The (filter, fields) evaluated against a block's `MatchGroups` before
+        it is mapped.
+        """
+        if self.filter and self.filter_fields is not None:
+            return [(self.filter, self.filter_fields)]
+        return []
+
+    def _describe(self):
+        if len(self.patterns) == 1:
+            return self.pattern.pattern
+        return ', '.join(str(pattern.name) for pattern in self.patterns)
+
+    def _reorder(self):
+        # NOTE: halving hits weights recent matches so the order adapts
+        if len(self.patterns) > 1:
+            self.patterns = sorted(
+                self.patterns, key=lambda pattern: pattern.hits, reverse=True
+            )
+            logger.debug(
+                '%s patterns re-ordered to %s', self.name,
+                ', '.join('{0}:{1}'.format(p.name, p.hits) for p in self.patterns),
+            )
+            for pattern in self.patterns:
+                pattern.hits //= 2
+        self.matches = 0
+
     def match(self, path):
         """
         Determines whether a path is associated with this source.
@@ -240,3 +706,200 @@ class Source(object):
             if glob.match(path):
                 return True
         return False
+
+
+class SourcePattern(object):
+    """
+    One of a `Source`'s patterns along with the literals a block must contain
+    to match it and a count of blocks it has matched.
+    """
+
+    def __init__(self, name, regex, derive=True, fields=None):
+        """
+        :param name:
+            Name of the pattern.
+
+        :param regex:
+            Regex string or compiled regex.
+
+        :param derive:
+            Flag indicating whether to derive required literals from `regex`
+            (see `literals`).
+
+        :param fields:
+            Names of the groups to extract from matches or None for all.
+        """
+        if isinstance(regex, basestring):
+            regex = re.compile(regex)
+        self.name = name
+        self.regex = regex
+        self.literals = [
+            re.compile(re.escape(literal)) for literal in literals(regex)
+        ] if derive else []
+        self.groups = [
+            group for group in sorted(regex.groupindex, key=regex.groupindex.get)
+            if fields is None or group in fields
+        ]
+        self.hits = 0
+
+    def admits(self, raw):
+        """
+        Determines whether `raw` contains all required literals.
+        """
+        for literal in self.literals:
+            if not literal.search(raw):
+                return False
+        return True
+
+    def extract(self, match):
+        """
+        Extracts a `dict` of the non-None `groups` of a match.
+        """
+        groups = self.groups
+        if not groups:
+            return {}
+        if len(groups) == 1:
+            values = [match.group(groups[0])]
+        else:
+            values = match.group(*groups)
+        return dict(
+            (k, str(v)) for k, v in itertools.izip(groups, values) if v is not None
+        )
+
+
+class MatchGroups(collections.Mapping):
+    """
+    Read-only mapping of some of a match's groups to their, non-None, values.
+    Values are only converted to strings when looked up.
+    """
+
+    def __init__(self, match, fields):
+        self.match = match
+        self.fields = fields
+
+    def __getitem__(self, key):
+        if key not in self.fields or key not in self.match.re.groupindex:
+            raise KeyError(key)
+        value = self.match.group(key)
+        if value is None:
+            raise KeyError(key)
+        return str(value)
+
+    def __iter__(self):
+        for key in self.fields:
+            if key in self.match.re.groupindex and self.match.group(key) is not None:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def _any(patterns):
+    """
+    Combines regex strings, or compiled regexes, into one regex matching any
+    of them or None if there are none.
+    """
+    if not patterns:
+        return None
+    return re.compile('|'.join(
+        '(?:{0})'.format(getattr(pattern, 'pattern', pattern))
+        for pattern in patterns
+    ))
+
+
+def literals(pattern, limit=3):
+    """
+    Derives up to `limit` of the longest literal strings every match of a
+    compiled regex must contain, e.g.:
+
+    .. code::
+
+        >>> literals(re.compile(r'(?P<ip>\S+) - \[(?P<timestamp>.+?)\] "GET '))
+        ['] "GET ', ' - [']
+
+    Case-insensitive and unicode patterns have none.
+    """
+    if pattern.flags & re.IGNORECASE or not isinstance(pattern.pattern, str):
+        return []
+    found = []
+    for literal in _literals(sre_parse.parse(pattern.pattern, pattern.flags)):
+        if literal not in found:
+            found.append(literal)
+    found.sort(key=len, reverse=True)
+    return found[:limit]
+
+
+def _literals(items):
+    run = []
+    for op, av in items:
+        if op == sre_constants.LITERAL and av < 256:
+            run.append(chr(av))
+            continue
+        if run:
+            yield ''.join(run)
+            run = []
+        if op == sre_constants.SUBPATTERN:
+            for literal in _literals(av[1]):
+                yield literal
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+            for literal in _literals(av[2]):
+                yield literal
+    if run:
+        yield ''.join(run)
+
+
+# parallel
+
+_parallel_source = None
+
+
+def _parallel_init(source):
+    global _parallel_source
+
+    _parallel_source = source
+
+
+def _parallel_forms(args):
+    path, begin, end = args
+    results = []
+    with open(path, 'r') as fo:
+        fo.seek(begin, os.SEEK_SET)
+        for forms in _parallel_source.batches(fo, index=False):
+            for f, block in forms:
+                if block.begin >= end:
+                    return results
+                results.append((form.to_dict(f), block))
+    return results
+
+
+_pooled_sources = None
+
+
+def parse_pool(sources, jobs):
+    """
+    Creates a pool of `jobs` processes used by `Source.pooled_batches` to map
+    blocks for any of `sources`. Processes are forked so sources, and their
+    forms, need not be picklable but the pool should be created before any
+    threads are started.
+    """
+    return multiprocessing.Pool(
+        jobs, initializer=_pooled_init, initargs=(sources,)
+    )
+
+
+def _pooled_init(sources):
+    global _pooled_sources
+
+    _pooled_sources = dict((source.name, source) for source in sources)
+
+
+def _pooled_forms(args):
+    name, path, buf, base, begins, ends = args
+    batch = BlockBatch(path, buf, base, begins, ends)
+    results = []
+    try:
+        for f, block in _pooled_sources[name]._forms(batch):
+            results.append((form.to_dict(f), block.begin))
+    except Exception, ex:
+        return results, ex
+    return results, None
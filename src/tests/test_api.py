@@ -1,3 +1,4 @@
+import arrow
 import os
 import shutil
 from StringIO import StringIO
@@ -177,6 +178,25 @@ class TestConsume(TestCase):
             '{0}/sources/nginx-error.log'.format(self.fixture()): 1140,
         }, dict(channel.tracker))
 
+    def test_jobs(self):
+        channel = self._channel()
+        results = list(slurp.consume(
+            [self.fixture('sources', 'nginx-access.log'),
+             self.fixture('sources', 'nginx-error.log'),
+             ],
+            [channel],
+            jobs=2,
+        ))
+        matches = [
+            ('ts', '{0}/sources/nginx-access.log'.format(self.fixture())),
+            ('ts', '{0}/sources/nginx-error.log'.format(self.fixture()))
+        ]
+        self.assertItemsEqual([('tc', matches, 9, 2589, 0)], results)
+        self.assertDictEqual({
+            '{0}/sources/nginx-access.log'.format(self.fixture()): 1449,
+            '{0}/sources/nginx-error.log'.format(self.fixture()): 1140,
+        }, dict(channel.tracker))
+
     def test_stream(self):
         channel = self._channel()
         self.assertDictEqual({}, dict(channel.tracker))
@@ -233,6 +253,165 @@ class TestConsume(TestCase):
             '{0}/sources/nginx-access.log'.format(self.fixture()): 1449,
         }, dict(channel.tracker))
 
+    def test_pipeline(self):
+        channel = self._channel(pipeline=2, batch_size=4)
+        results = list(slurp.consume(
+            [self.fixture('sources', 'nginx-access.log'),
+             self.fixture('sources', 'nginx-error.log'),
+             ],
+            [channel],
+        ))
+        matches = [
+            ('ts', '{0}/sources/nginx-access.log'.format(self.fixture())),
+            ('ts', '{0}/sources/nginx-error.log'.format(self.fixture()))
+        ]
+        self.assertItemsEqual([('tc', matches, 9, 2589, 0)], results)
+        self.assertDictEqual({
+            '{0}/sources/nginx-access.log'.format(self.fixture()): 1449,
+            '{0}/sources/nginx-error.log'.format(self.fixture()): 1140,
+        }, dict(channel.tracker))
+
+    def test_pipeline_flush(self):
+
+        class _Sink(slurp.Sink):
+
+            def __call__(self, form, block):
+                if block.begin == 385:
+                    raise ValueError('poop')
+                return True
+
+            def flush(self):
+                self.offsets.append(dict(self.channel.tracker))
+
+        path = self.fixture('sources', 'nginx-access.log')
+        runs = []
+        for pipeline in [0, 1]:
+            sink = _Sink('tk')
+            sink.offsets = []
+            channel = self._channel(
+                sink=sink, strict=False, pipeline=pipeline, batch_size=2,
+            )
+            sink.channel = channel
+            results = list(slurp.consume([path], [channel]))
+            runs.append((results, sink.offsets, dict(channel.tracker)))
+        self.assertEqual(runs[0], runs[1])
+        self.assertEqual(
+            ([('tc', [('ts', path)], 5, 1177, 1)],
+             [{}, {path: 657}, {path: 1177}],
+             {path: 1449}),
+            runs[1],
+        )
+
+    def test_batch_limits(self):
+
+        class _Sink(slurp.Sink):
+
+            def __call__(self, form, block):
+                self.pending.append(block)
+                return True
+
+            def flush(self):
+                self.flushes.append(len(self.pending))
+                self.pending = []
+
+        path = self.fixture('sources', 'nginx-access.log')
+        sink = _Sink('tk')
+        sink.pending, sink.flushes = [], []
+        channel = self._channel(sink=sink, batch_bytes=500)
+        list(slurp.consume([path], [channel]))
+        self.assertListEqual([3, 2, 1], sink.flushes)
+
+        sink.pending, sink.flushes = [], []
+        channel = self._channel(sink=sink, batch_latency=0.000001)
+        list(slurp.consume([path], [channel]))
+        self.assertListEqual([1, 1, 1, 1, 1, 1], sink.flushes)
+        self.assertDictEqual({path: 1449}, dict(channel.tracker))
+
+    def test_batch_adaptive(self):
+        channel = self._channel(
+            batch_size=100, batch_adaptive=True, batch_size_min=20, batch_size_max=200,
+        )
+        consume = channel.consumer()
+        sizes = []
+        for latency in [0.01, 0.01, 0.009, 0.011, 0.02, None, None, None, 0.001]:
+            consume.adapt(latency)
+            sizes.append(consume.batch_size)
+        # NOTE: rising latency within tolerance holds the size
+        self.assertListEqual([110, 120, 130, 130, 65, 32, 20, 20, 30], sizes)
+        channel = self._channel(batch_size=None, batch_adaptive=True, batch_size_max=50)
+        consume = channel.consumer()
+        self.assertEqual(consume.batch_size, 50)
+        consume.adapt(None)
+        self.assertEqual(consume.batch_size, 25)
+        with self.assertRaises(ValueError):
+            self._channel(batch_size=None, batch_adaptive=True)
+
+        class _Sink(slurp.Sink):
+
+            def __call__(self, form, block):
+                return True
+
+            def flush(self):
+                time.sleep(0.01)
+
+        # NOTE: only batches reaching a limit, of 2 then 3 blocks, adapt
+        path = self.fixture('sources', 'nginx-access.log')
+        channel = self._channel(sink=_Sink('tk'), batch_size=2, batch_adaptive=True)
+        with channel.consumer() as consume:
+            consume(path)
+        self.assertEqual(consume.batch_size, 4)
+        self.assertDictEqual({path: 1449}, dict(channel.tracker))
+
+        # NOTE: as do those reaching a bytes limit
+        channel = self._channel(
+            sink=_Sink('tk'), batch_size=100, batch_bytes=500, batch_adaptive=True,
+        )
+        with channel.consumer() as consume:
+            consume(path)
+        self.assertNotEqual(consume.batch_size, 100)
+
+    def test_parse_workers(self):
+
+        class _Sink(slurp.Sink):
+
+            def __call__(self, form, block):
+                self.forms.append((form, block))
+
+        paths = [
+            self.fixture('sources', 'nginx-access.log'),
+            self.fixture('sources', 'nginx-error.log'),
+        ]
+        runs = []
+        for parse_workers in [0, 2]:
+            sink = _Sink('tk')
+            sink.forms = []
+            channel = self._channel(sink=sink, parse_workers=parse_workers)
+            results = list(slurp.consume(paths, [channel]))
+            runs.append((results, sink.forms, dict(channel.tracker)))
+        self.assertEqual(runs[0], runs[1])
+        self.assertEqual(9, len(runs[1][1]))
+        self.assertDictEqual({paths[0]: 1449, paths[1]: 1140}, runs[1][2])
+
+    def test_since_until(self):
+        path = os.path.join(self.tmp_dir(), 'nginx-times')
+        with open(path, 'w') as fo:
+            for i in xrange(1000):
+                fo.write('{0} request\n'.format(1392940800 + i))
+        channel = self._channel(sink=slurp.Tally('tk'))
+        del channel.sources[:]
+        channel.add_source(
+            'ts', ['*/nginx-*'], r'(?P<timestamp>\d+) (?P<message>.+)',
+            timestamp='timestamp',
+        )
+        results = list(slurp.consume(
+            [path],
+            [channel],
+            since=arrow.get('2014-02-21T00:01:40').datetime,
+            until=1392940800 + 200,
+        ))
+        self.assertItemsEqual([('tc', [('ts', path)], 100, 1900, 0)], results)
+        self.assertDictEqual({path: 200 * 19}, dict(channel.tracker))
+
 
 
 class TestWatch(TestCase):
@@ -1,7 +1,9 @@
 import os
 
 import slurp
-from slurp.block import LineIterator, MultiLineIterator
+from slurp.block import (
+    LineIterator, MultiLineIterator, MmapLineIterator, MmapMultiLineIterator,
+)
 
 from . import TestCase
 
@@ -56,3 +58,152 @@ class TestBlocks(TestCase):
             ],
             map(lambda x: (x.path, x.begin, x.end), list(blocks))
         )
+
+    def test_mmap(self):
+        prefix = r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3} :'
+        for name, prefix, iter_cls in [
+                ('access.log', None, MmapLineIterator),
+                ('error.log', prefix, MmapMultiLineIterator),
+            ]:
+            path = self.fixture('sources', name)
+            mapped = slurp.Blocks(open(path, 'r'), strict=True, prefix=prefix)
+            self.assertIsInstance(mapped.__iter__(), iter_cls)
+            read = slurp.Blocks(
+                self.io_fixture(self.read_fixture('sources', name)),
+                strict=True,
+                prefix=prefix,
+            )
+            self.assertListEqual(
+                map(lambda x: (x.begin, x.end, x.raw), list(read)),
+                map(lambda x: (x.begin, x.end, x.raw), list(mapped)),
+            )
+            mapped.seek(0)
+            for block in mapped:
+                self.assertIsInstance(block.raw, str)
+                self.assertTrue(block.raw.endswith('\n'))
+            mapped.seek(0)
+            for batch in mapped.batches(max_blocks=2):
+                for block in batch:
+                    self.assertIsInstance(block.raw, str)
+
+    def test_mmap_grow(self):
+        path = self.tmp_file()
+        lines = self.read_fixture('sources', 'access.log').splitlines(True)
+        with open(path, 'w') as fo:
+            fo.writelines(lines[:2])
+            fo.write(lines[2][:10])
+        with open(path, 'r') as fo:
+            blocks = slurp.Blocks(fo, strict=True)
+            self.assertListEqual(
+                [(0, 309), (309, 650)],
+                map(lambda x: (x.begin, x.end), list(blocks)),
+            )
+            self.assertEqual(fo.tell(), 650)
+            with open(path, 'a') as wfo:
+                wfo.write(lines[2][10:])
+                wfo.writelines(lines[3:])
+            self.assertListEqual(
+                [(650, 987), (987, 1312), (1312, 1631), (1631, 1950)],
+                map(lambda x: (x.begin, x.end), list(blocks)),
+            )
+
+    def test_small_reads(self):
+        prefix = r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3} :'
+        for name, prefix in [('access.log', None), ('error.log', prefix)]:
+            raw = self.read_fixture('sources', name)
+            expected = list(slurp.Blocks(
+                self.io_fixture(raw), strict=True, prefix=prefix
+            ))
+            blocks = slurp.Blocks(
+                self.io_fixture(raw), strict=True, prefix=prefix, read_size=7,
+            )
+            self.assertListEqual(expected, list(blocks))
+
+    def test_max_buffer_size(self):
+        io = self.io_fixture('a' * 10 + '\n' + 'b' * 5000 + '\n' + 'c' * 10 + '\n')
+        blocks = slurp.Blocks(io, read_size=1024, max_buffer_size=2048)
+        self.assertListEqual([
+                (0, 11, 'a' * 10 + '\n'),
+                (5012, 5023, 'c' * 10 + '\n'),
+            ],
+            map(lambda x: (x.begin, x.end, x.raw), list(blocks))
+        )
+        io.seek(0)
+        blocks = slurp.Blocks(io, strict=True, read_size=1024, max_buffer_size=2048)
+        with self.assertRaises(ValueError):
+            list(blocks)
+
+    def test_batches(self):
+        prefix = r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3} :'
+        for name, prefix in [('access.log', None), ('error.log', prefix)]:
+            raw = self.read_fixture('sources', name)
+            expected = map(
+                lambda x: (x.begin, x.end, str(x.raw)),
+                slurp.Blocks(self.io_fixture(raw), strict=True, prefix=prefix),
+            )
+            for fo in [self.io_fixture(raw), self.open_fixture('sources', name)]:
+                blocks = slurp.Blocks(fo, strict=True, prefix=prefix)
+                batches = list(blocks.batches(max_blocks=2))
+                self.assertTrue(all(isinstance(b, slurp.BlockBatch) for b in batches))
+                self.assertTrue(all(0 < len(b) <= 2 for b in batches))
+                self.assertListEqual(expected, [
+                    (block.begin, block.end, str(block.raw))
+                    for batch in batches for block in batch
+                ])
+
+    def test_batches_max_bytes(self):
+        blocks = slurp.Blocks(self.open_fixture('sources', 'access.log'))
+        self.assertListEqual([
+                [(0, 309), (309, 650)],
+                [(650, 987), (987, 1312)],
+                [(1312, 1631), (1631, 1950)],
+            ],
+            [zip(b.begins, b.ends) for b in blocks.batches(max_bytes=700)]
+        )
+
+    def test_multi_line_embedded_preamble(self):
+        raw = (
+            'junk\n'
+            '2014-01-01 a\nb 2014-01-02 x\nc\n'
+            '2014-01-03 d\n'
+            '2014-01-04 e\n'
+        )
+        for read_size in [1, 3, 7, 1024]:
+            blocks = slurp.Blocks(
+                self.io_fixture(raw),
+                prefix=r'\d{4}-\d{2}-\d{2} ',
+                read_size=read_size,
+            )
+            self.assertListEqual([
+                    (5, 35, '2014-01-01 a\nb 2014-01-02 x\nc\n'),
+                    (35, 48, '2014-01-03 d\n'),
+                    (48, 61, '2014-01-04 e\n'),
+                ],
+                map(lambda x: (x.begin, x.end, x.raw), list(blocks))
+            )
+        blocks = slurp.Blocks(
+            self.io_fixture(raw), strict=True, prefix=r'\d{4}-\d{2}-\d{2} ',
+        )
+        with self.assertRaises(ValueError):
+            list(blocks)
+
+    def test_align(self):
+        prefix = r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3} :'
+        for name, prefix in [('access.log', None), ('error.log', prefix)]:
+            raw = self.read_fixture('sources', name)
+            mapped = slurp.Blocks(self.open_fixture('sources', name), prefix=prefix)
+            for read_size in [1, 7, 1024]:
+                io = self.io_fixture(raw)
+                io.seek(100)
+                reads = []
+                read = io.read
+                io.read = lambda size=-1: reads.append(size) or read(size)
+                blocks = slurp.Blocks(io, prefix=prefix, read_size=read_size)
+                for offset in range(0, len(raw) + 2, 37):
+                    del reads[:]
+                    self.assertEqual(
+                        mapped.align(offset), blocks.align(offset), (name, offset),
+                    )
+                    self.assertEqual(io.tell(), 100)
+                    # NOTE: read forward in chunks, never the whole rest
+                    self.assertTrue(all(size == read_size for size in reads))
@@ -1,4 +1,10 @@
-from slurp.channel import Tracker
+import collections
+import os
+import threading
+import time
+
+import slurp
+from slurp.channel import LogTracker, Tracker
 
 from . import TestCase
 
@@ -44,3 +50,235 @@ class TestTracker(TestCase):
         self.assertTrue('/test/file/2' in tracker)
         self.assertTrue('/test/file/3' in tracker)
         self.assertFalse('/test/file/4' in tracker)
+
+    def test_defer(self):
+        path = self.tmp_file()
+        tracker = Tracker(path)
+        with tracker.defer():
+            tracker['/test/file/1'] = 1243
+            tracker['/test/file/1'] = 1250
+            tracker['/test/file/2'] = 321
+            self.assertEqual(tracker['/test/file/1'], 1250)
+            self.assertDictEqual({}, dict(Tracker(path)))
+            tracker.commit()
+            self.assertDictEqual(
+                {'/test/file/1': 1250, '/test/file/2': 321}, dict(Tracker(path)),
+            )
+            tracker['/test/file/2'] = 400
+            self.assertEqual(Tracker(path)['/test/file/2'], 321)
+        self.assertEqual(Tracker(path)['/test/file/2'], 400)
+
+    def test_commit_interval(self):
+        path = self.tmp_file()
+        tracker = Tracker(path, commit_interval=60)
+        with tracker.defer():
+            tracker['/test/file/1'] = 1243
+            self.assertDictEqual({}, dict(Tracker(path)))
+            tracker.committed_at -= 60
+            tracker['/test/file/1'] = 1250
+            self.assertDictEqual({'/test/file/1': 1250}, dict(Tracker(path)))
+
+    def test_read_only(self):
+        path = self.tmp_file()
+        self.assertDictEqual({}, dict(Tracker(path, read_only=True)))
+        self.assertFalse(os.path.exists(path))
+        tracker = Tracker(path)
+        tracker['/test/file/1'] = 1243
+        reader = Tracker(path, read_only=True)
+        with self.assertRaises(ValueError):
+            reader['/test/file/1'] = 1250
+        # NOTE: an open write transaction does not block readers
+        tracker.cxn.execute('BEGIN IMMEDIATE')
+        tracker.cxn.execute("UPDATE tracks SET offset = 1250")
+        self.assertDictEqual({'/test/file/1': 1243}, dict(reader))
+        tracker.cxn.commit()
+        self.assertDictEqual({'/test/file/1': 1250}, dict(reader))
+
+    def test_channel_emitted(self):
+        committed = []
+
+        class Sink(slurp.Sink):
+
+            def __call__(self, form, block):
+                committed.append(dict(Tracker(channel.tracker.path)))
+
+        channel = slurp.Channel(
+            'tc', Sink('tk'), state_dir=self.tmp_dir(), track=True,
+            backfill=True, batch_size=2,
+        )
+        channel.add_source('ts', ['*/nginx-*'], r'(?P<all>.*)')
+        path = self.fixture('sources', 'nginx-access.log')
+        channel.consume(path)
+        # NOTE: offsets of emitted blocks are committed every batch_size blocks
+        self.assertListEqual(
+            [{}, {}, {path: 385}, {path: 385}, {path: 913}, {path: 913}],
+            committed,
+        )
+        self.assertDictEqual({path: 1449}, dict(Tracker(channel.tracker.path)))
+        # NOTE: without a batch_size they are committed when consuming stops
+        del committed[:]
+        channel = slurp.Channel(
+            'tc', Sink('tk'), state_dir=self.tmp_dir(), track=True,
+            backfill=True, batch_size=None,
+        )
+        channel.add_source('ts', ['*/nginx-*'], r'(?P<all>.*)')
+        channel.consume(path)
+        self.assertListEqual([{}] * 6, committed)
+        self.assertDictEqual({path: 1449}, dict(Tracker(channel.tracker.path)))
+
+
+class TestLogTracker(TestCase):
+
+    def test_iface(self):
+        tracker = LogTracker(':memory:')
+        self.assertEqual(len(tracker), 0)
+        tracker['/test/file/1'] = 1243
+        tracker['/test/file/2'] = 321
+        tracker['/test/file/1'] = 1250
+        self.assertDictEqual({'/test/file/1': 1250, '/test/file/2': 321}, dict(tracker))
+        del tracker['/test/file/2']
+        self.assertFalse('/test/file/2' in tracker)
+        with self.assertRaises(KeyError):
+            del tracker['/test/file/2']
+
+    def test_persist(self):
+        path = self.tmp_file()
+        tracker = LogTracker(path)
+        with tracker.defer():
+            tracker['/test/file/1'] = 1243
+            tracker['/test/file/2'] = 321
+            self.assertDictEqual({}, dict(LogTracker(path)))
+        tracker['/test/file/1'] = 1250
+        del tracker['/test/file/2']
+        tracker.close()
+        self.assertDictEqual({'/test/file/1': 1250}, dict(LogTracker(path)))
+        # NOTE: partial writes are discarded
+        with open(path, 'ab') as fo:
+            fo.write(LogTracker.record.pack(LogTracker.OFFSET, 0, 1300)[:-3])
+        tracker = LogTracker(path)
+        self.assertDictEqual({'/test/file/1': 1250}, dict(tracker))
+        tracker['/test/file/1'] = 1300
+        self.assertDictEqual({'/test/file/1': 1300}, dict(LogTracker(path)))
+
+    def test_compact(self):
+        path = self.tmp_file()
+        tracker = LogTracker(path, compact_size=10)
+        reader = LogTracker(path, read_only=True)
+        for i in xrange(25):
+            tracker['/test/file/{0}'.format(i % 2)] = i
+        self.assertLessEqual(LogTracker(path).updates, 10)
+        self.assertDictEqual({'/test/file/0': 24, '/test/file/1': 23}, dict(reader))
+        with self.assertRaises(ValueError):
+            reader['/test/file/0'] = 0
+        tracker.close()
+        self.assertDictEqual(dict(tracker), dict(LogTracker(path)))
+
+    def test_writers(self):
+        path = self.tmp_file()
+        daemon, cli = LogTracker(path), LogTracker(path)
+        daemon['/a'] = 1
+        cli['/b'] = 2
+        daemon['/c'] = 3
+        cli['/b'] = 5
+        daemon['/c'] = 6
+        self.assertDictEqual({'/a': 1, '/b': 5, '/c': 6}, dict(LogTracker(path)))
+        daemon.compact()
+        self.assertDictEqual({'/a': 1, '/b': 5, '/c': 6}, dict(LogTracker(path)))
+        cli['/b'] = 7
+        self.assertDictEqual({'/a': 1, '/b': 7, '/c': 6}, dict(LogTracker(path)))
+        # NOTE: writers wait for one another to commit
+        done = threading.Event()
+
+        def write():
+            cli['/d'] = 8
+            done.set()
+
+        with daemon.defer():
+            daemon['/a'] = 9
+            thread = threading.Thread(target=write)
+            thread.start()
+            self.assertFalse(done.wait(0.1))
+        thread.join()
+        self.assertDictEqual(
+            {'/a': 9, '/b': 7, '/c': 6, '/d': 8}, dict(LogTracker(path)),
+        )
+
+    def test_channel(self):
+        channel = slurp.Channel(
+            'tc', slurp.Drop('tk'), state_dir=self.tmp_dir(), track=True,
+            backfill=True, tracker='log',
+        )
+        channel.add_source('ts', ['*/nginx-*'], r'(?P<all>.*)')
+        path = self.fixture('sources', 'nginx-access.log')
+        channel.consume(path)
+        self.assertIsInstance(channel.tracker, LogTracker)
+        self.assertDictEqual({path: 1449}, dict(LogTracker(channel.tracker.path)))
+
+
+class TestSharedSource(TestCase):
+
+    def _channel(self, name, sink, **kwargs):
+        channel = slurp.Channel(
+            name, sink, state_dir=self.tmp_dir(), track=True, backfill=True, **kwargs
+        )
+        channel.add_source('ts', ['*/nginx-*'], r'(?P<ip>\S+) (?P<all>.*)')
+        return channel
+
+    def test_share(self):
+        path = self.fixture('sources', 'nginx-access.log')
+        received = collections.defaultdict(list)
+
+        class Sink(slurp.Sink):
+
+            def __call__(self, form, block):
+                received[self.name].append((form, block))
+
+        channels = [
+            self._channel('tc1', Sink('tk1')),
+            self._channel('tc2', Sink('tk2'), form=self.Form),
+            self._channel('tc3', Sink('tk3'), filter_fields=['ip']),
+        ]
+        shared = slurp.share(channels)
+        self.assertEqual(len(shared), 1)
+        self.assertIs(channels[0].sources[0].shared, shared[0])
+        self.assertIsNone(channels[2].sources[0].shared)
+        for channel in channels:
+            channel.consume(path)
+            self.assertDictEqual({path: 1449}, dict(channel.tracker))
+        # NOTE: misses include each channel finding nothing more at EOF
+        self.assertEqual((shared[0].misses, shared[0].hits), (3, 1))
+        self.assertEqual(len(shared[0].parsed), 0)
+        self.assertEqual(len(received['tk1']), 6)
+        self.assertEqual(len(received['tk3']), 6)
+        self.assertEqual(
+            [block for _, block in received['tk1']],
+            [block for _, block in received['tk2']],
+        )
+        for (f1, _), (f2, _) in zip(received['tk1'], received['tk2']):
+            self.assertIsInstance(f2, self.Form)
+            self.assertEqual(f2.ip, f1['ip'])
+
+    class Form(slurp.Form):
+
+        ip = slurp.form.String()
+
+
+class TestChannelConsumer(TestCase):
+
+    def test_batch_latency(self):
+        channel = slurp.Channel(
+            'tc', slurp.Drop('tk'), state_dir=self.tmp_dir(), track=True,
+            backfill=True, batch_size=1000, flush_frequency=60, batch_latency=0.05,
+        )
+        channel.add_source('ts', ['*/nginx-*'], r'(?P<all>.*)')
+        consume = channel.consumer()
+        consume(self.fixture('sources', 'nginx-access.log'))
+        self.assertEqual(consume.pending, 6)
+        # NOTE: a lull is bounded by batch_latency, not flush_frequency
+        self.assertLessEqual(consume.flush_poll, 0.05)
+        self.assertFalse(consume.flush_expired)
+        time.sleep(consume.flush_poll + 0.01)
+        self.assertTrue(consume.flush_expired)
+        consume.flush()
+        self.assertEqual(consume.pending, 0)
+        self.assertIsNone(consume.flush_poll)
@@ -0,0 +1,84 @@
+import bz2
+import gzip
+import os
+
+import slurp
+from slurp.compress import Checkpoints, DecompressingFile, codec
+
+from . import TestCase
+
+
+class TestDecompressingFile(TestCase):
+
+    def _gzip(self, *members):
+        path = os.path.join(self.tmp_dir(), 'access.log.1.gz')
+        with open(path, 'wb') as fo:
+            for member in members:
+                gz = gzip.GzipFile(fileobj=fo, mode='wb')
+                gz.write(member)
+                gz.close()
+        return path
+
+    def test_read(self):
+        raw = self.read_fixture('sources', 'nginx-access.log')
+        path = self._gzip(raw)
+        with slurp.compress.open(path) as fo:
+            self.assertIsInstance(fo, DecompressingFile)
+            self.assertEqual(fo.read(), raw)
+            self.assertEqual(fo.tell(), len(raw))
+            fo.seek(100)
+            self.assertEqual(fo.read(10), raw[100:110])
+            fo.seek(0, os.SEEK_END)
+            self.assertEqual(fo.tell(), len(raw))
+
+    def test_bz2(self):
+        raw = self.read_fixture('sources', 'nginx-error.log')
+        path = os.path.join(self.tmp_dir(), 'error.log.1.bz2')
+        with open(path, 'wb') as fo:
+            fo.write(bz2.compress(raw) + bz2.compress(raw))
+        with DecompressingFile(path, codec(path), read_size=128) as fo:
+            self.assertEqual(fo.read(), raw + raw)
+            self.assertIn((len(raw), len(bz2.compress(raw))), fo.checkpoints)
+
+    def test_uncompressed(self):
+        path = self.fixture('sources', 'nginx-access.log')
+        self.assertIsNone(codec(path))
+        with slurp.compress.open(path) as fo:
+            self.assertIsInstance(fo, file)
+
+    def test_checkpoints(self):
+        raw = self.read_fixture('sources', 'nginx-access.log')
+        path = self._gzip(raw, raw, raw)
+        checkpoints = Checkpoints(os.path.join(self.tmp_dir(), 'tc.checkpoints'))
+        inode = os.stat(path).st_ino
+        with slurp.compress.open(path, on_close=checkpoints.update) as fo:
+            blocks = list(slurp.Blocks(fo))
+            self.assertEqual(blocks[-1].end, 3 * len(raw))
+            self.assertEqual(
+                [offset for offset, _ in fo.checkpoints],
+                [0, len(raw), 2 * len(raw)],
+            )
+        checkpoints = Checkpoints(checkpoints.path)
+        self.assertEqual(len(checkpoints.get(path, inode)), 3)
+        self.assertEqual(checkpoints.get(path, inode + 1), [])
+        with slurp.compress.open(path, checkpoints.get(path, inode)) as fo:
+            fo.seek(2 * len(raw) + 10)
+            self.assertEqual(fo.fo.tell(), os.path.getsize(path))
+            self.assertEqual(fo.read(), raw[10:])
+
+    def test_consume(self):
+        raw = self.read_fixture('sources', 'nginx-access.log')
+        path = self._gzip(raw, raw)
+        channel = slurp.Channel(
+            'tc', slurp.Drop('tk'),
+            state_dir=self.tmp_dir(),
+            track=True,
+            backfill=True,
+        )
+        channel.add_source('ts', ['*/access*'], r'(?P<all>.*)')
+        results = list(slurp.consume([path], [channel]))
+        self.assertItemsEqual([('tc', [('ts', path)], 12, 2 * len(raw), 0)], results)
+        self.assertDictEqual({path: 2 * len(raw)}, dict(channel.tracker))
+        self.assertTrue(os.path.isfile(
+            os.path.join(channel.state_dir, 'tc.checkpoints')
+        ))
@@ -1,3 +1,5 @@
+import os
+
 import slurp
 
 from  . import TestCase
@@ -19,10 +21,18 @@ class TestConfig(TestCase):
             'form',
             'pattern',
             'filter',
+            'filter_fields',
+            'raw_filter',
+            'raw_include',
+            'raw_exclude',
             'strict',
             'prefix',
             'read_size',
             'buffer_size',
+            'timestamp',
+            'index_interval',
+            'prefilter',
+            'patterns',
             'globs',
         ], settings.keys())
         self.assertIsNotNone(settings.prefix)
@@ -62,3 +72,37 @@ class TestConfig(TestCase):
             ], config.channel_names)
         map(config.channel_settings, config.channel_names)
         map(config.channel, config.channel_names)
+
+    def test_source_patterns(self):
+        path = os.path.join(self.tmp_dir(), 'sources.conf')
+        with open(path, 'w') as fo:
+            fo.write('''\
+[source:mixed]
+globs = **/mixed*
+patterns[health] =
+
+    (?P<ip>\S+)\s+-\s+-\s+\[(?P<timestamp>[^\]]+)\]\s+"GET\s+/health
+
+patterns[request] =
+
+    (?P<ip>\S+)\s+-\s+(?P<user>\S+)\s+\[(?P<timestamp>[^\]]+)\]\s+
+    "(?P<method>\w+)\s+(?P<uri>\S+)
+
+form =
+
+    class form(slurp.Form):
+
+        ip = slurp.form.String()
+        pattern = slurp.form.String('pattern').from_context()
+''')
+        config = slurp.Config(includes=[path])
+        settings = config.source_settings('mixed')
+        self.assertIsNone(settings.pattern)
+        self.assertItemsEqual(['health', 'request'], settings.patterns.keys())
+        source = config.source('mixed')
+        with self.open_fixture('sources', 'nginx-access.log') as fo:
+            forms = [f for f, _ in source.forms(fo)]
+        self.assertEqual(
+            ['health', 'request', 'request', 'request', 'request', 'request'],
+            [f['pattern'] for f in forms],
+        )
@@ -0,0 +1,231 @@
+import BaseHTTPServer
+import datetime
+import json
+import SocketServer
+import threading
+import time
+import zlib
+
+import slurp
+from slurp.ext.elasticsearch_bulk import BulkError, ElasticSearchBulk
+
+from . import TestCase
+
+
+class StubServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Mimics the elasticsearch `_bulk` endpoint. Documents whose id is in
+    `transient` fail with 429 that many times and those in `permanent` always
+    fail with 400. Requests take at least `delay` seconds and the most handled
+    at once is kept as `concurrency`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), StubHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.encodings = []
+        self.clients = set()
+        self.indexed = []
+        self.transient = {}
+        self.permanent = set()
+        self.delay = 0
+        self.active = 0
+        self.concurrency = 0
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}'.format(*self.server_address)
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        encoding = self.headers.get('Content-Encoding')
+        if encoding == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        lines = body.splitlines()
+        items, errors = [], False
+        with server.lock:
+            server.active += 1
+            server.concurrency = max(server.concurrency, server.active)
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+            server.requests.append((self.path, self.headers.get('Content-Type'), body))
+            server.encodings.append(encoding)
+            server.clients.add(self.client_address)
+            for action, source in zip(lines[::2], lines[1::2]):
+                action = json.loads(action)['index']
+                doc_id = action.get('_id')
+                if server.transient.get(doc_id):
+                    server.transient[doc_id] -= 1
+                    status = 429
+                elif doc_id in server.permanent:
+                    status = 400
+                else:
+                    server.indexed.append((action, json.loads(source)))
+                    status = 201
+                errors = errors or status >= 300
+                result = {'_id': doc_id, 'status': status}
+                if status >= 300:
+                    result['error'] = 'nope'
+                items.append({'index': result})
+        response = json.dumps({'took': 1, 'errors': errors, 'items': items})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+
+class TestElasticSearchBulk(TestCase):
+
+    def setUp(self):
+        super(TestElasticSearchBulk, self).setUp()
+        self.server = StubServer()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super(TestElasticSearchBulk, self).tearDown()
+
+    def _sink(self, **kwargs):
+        kwargs.setdefault('retry_backoff', 0)
+        return ElasticSearchBulk('tk', [self.server.url], **kwargs)
+
+    def _form(self, i, **document):
+        document.setdefault('i', i)
+        return {'index': 'ti', 'type': 'tt', 'id': str(i), 'document': document}
+
+    def test_index(self):
+        sink = self._sink(bulk_size=3, concurrency=2)
+        at = datetime.datetime(2014, 2, 21, 0, 0, 2)
+        for i in xrange(10):
+            self.assertTrue(sink(self._form(i, at=at), None))
+        sink.flush()
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertLessEqual(len(self.server.clients), 2)
+        path, content_type, body = [
+            request for request in self.server.requests
+            if json.loads(request[2].splitlines()[0])['index']['_id'] == '0'
+        ][0]
+        self.assertEqual(path, '/_bulk')
+        self.assertEqual(content_type, 'application/x-ndjson')
+        self.assertEqual(map(json.loads, body.splitlines()[:2]), [
+            {'index': {'_index': 'ti', '_type': 'tt', '_id': '0'}},
+            {'i': 0, 'at': '2014-02-21T00:00:02'},
+        ])
+        self.assertItemsEqual(
+            range(10), [source['i'] for _, source in self.server.indexed],
+        )
+
+    def test_bulk_bytes(self):
+        sink = self._sink(bulk_size=100)
+        sink.limits(batch_size=100, batch_bytes=200)
+        self.assertEqual(sink.bulk_bytes, 200)
+        for i in xrange(10):
+            sink(self._form(i, padding='x' * 50), None)
+        sink.flush()
+        self.assertEqual(len(self.server.indexed), 10)
+        self.assertEqual(len(self.server.requests), 5)
+        for _, _, body in self.server.requests[:-1]:
+            self.assertLess(len(body), 200 + 150)
+
+    def test_retry(self):
+        self.server.transient = {'3': 2, '7': 1}
+        sink = self._sink(bulk_size=4, retries=2)
+        for i in xrange(10):
+            sink(self._form(i), None)
+        sink.flush()
+        indexed = [source['i'] for _, source in self.server.indexed]
+        self.assertItemsEqual(range(10), indexed)
+        self.assertEqual(len(self.server.requests), 5)
+        # NOTE: only failed documents are retried
+        self.assertEqual(len(self.server.requests[3][2].splitlines()), 4)
+        self.assertEqual(len(self.server.requests[4][2].splitlines()), 2)
+
+    def test_gzip(self):
+        self.server.transient = {'3': 1}
+        sink = self._sink(bulk_size=4, compression='gzip', compression_level=1)
+        for i in xrange(10):
+            sink(self._form(i, padding='x' * 50), None)
+            self.assertLess(len(''.join(sink.body.chunks)), sink.body.raw_size or 1)
+        sink.flush()
+        indexed = [source['i'] for _, source in self.server.indexed]
+        self.assertItemsEqual(range(10), indexed)
+        self.assertEqual(self.server.encodings, ['gzip'] * 4)
+        self.assertEqual(len(self.server.requests[3][2].splitlines()), 2)
+
+    def test_failures(self):
+        self.server.transient = {'1': 5}
+        self.server.permanent = set(['2'])
+        sink = self._sink(bulk_size=10, retries=1)
+        for i in xrange(4):
+            sink(self._form(i), None)
+        with self.assertRaises(BulkError) as ctx:
+            sink.flush()
+        self.assertItemsEqual(
+            [(429, 'nope'), (400, 'nope')],
+            [(status, error) for _, status, error in ctx.exception.failures],
+        )
+        self.assertItemsEqual(
+            [0, 3], [source['i'] for _, source in self.server.indexed],
+        )
+        sink(self._form(4), None)
+        sink.flush()
+
+    def test_channel(self):
+        test = self
+
+        class _Sink(ElasticSearchBulk):
+
+            def __call__(self, form, block):
+                form = test._form(block.begin, ip=form['ip'])
+                return super(_Sink, self).__call__(form, block)
+
+        sink = _Sink('tk', [self.server.url], bulk_size=4)
+        channel = slurp.Channel(
+            'tc', sink, state_dir=self.tmp_dir(), track=True, backfill=True,
+            batch_size=4,
+        )
+        channel.add_source('ts', ['*/nginx-*'], r'(?P<ip>\S+) .*')
+        path = self.fixture('sources', 'nginx-access.log')
+        channel.consume(path)
+        self.assertEqual(len(self.server.indexed), 6)
+        self.assertDictEqual({path: 1449}, dict(channel.tracker))
+
+    def test_channel_concurrency(self):
+        test = self
+
+        class _Sink(ElasticSearchBulk):
+
+            def __call__(self, form, block):
+                form = test._form(block.begin, ip=form['ip'])
+                return super(_Sink, self).__call__(form, block)
+
+        self.server.delay = 0.1
+        sink = _Sink('tk', [self.server.url], concurrency=2)
+        channel = slurp.Channel(
+            'tc', sink, state_dir=self.tmp_dir(), track=True, backfill=True,
+            batch_size=6,
+        )
+        self.assertEqual(sink.bulk_size, 3)
+        channel.add_source('ts', ['*/nginx-*'], r'(?P<ip>\S+) .*')
+        path = self.fixture('sources', 'nginx-access.log')
+        channel.consume(path)
+        self.assertEqual(len(self.server.indexed), 6)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.concurrency, 2)
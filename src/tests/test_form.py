@@ -0,0 +1,49 @@
+import arrow
+
+import slurp
+from slurp.form import DatetimeParser
+
+from . import TestCase
+
+
+class TestDatetime(TestCase):
+
+    def test_parse(self):
+        for format, values in [
+                ('DD/MMM/YYYY:HH:mm:ss', [
+                    '20/Feb/2014:11:37:58',
+                    '20/Feb/2014:11:37:59',
+                    '20/Feb/2014:11:38:00',
+                    '[20/Feb/2014:11:38:01]',
+                    '20/Feb/2014:11:37:58',
+                ]),
+                ('YYYY-MM-DD HH:mm:ss.SSS', ['2014-02-20 11:37:58.123']),
+                ('MMMM D, YY', ['February 5, 14']),
+                ('YYYY-MM-DDTHH:mm:ssZ', ['2014-02-20T11:37:58-0700']),
+            ]:
+            parser = DatetimeParser(format)
+            for value in values:
+                self.assertEqual(parser(value), arrow.get(value, format).datetime)
+
+    def test_memoize(self):
+        parser = DatetimeParser('DD/MMM/YYYY:HH:mm:ss', cache_size=2)
+        parser('20/Feb/2014:11:37:58')
+        self.assertEqual(parser.last[2], len('20/Feb/2014:11:37:'))
+        self.assertEqual(
+            parser('20/Feb/2014:11:37:59'),
+            arrow.get('2014-02-20T11:37:59').datetime,
+        )
+        self.assertEqual(parser.cache.keys(), ['20/Feb/2014:11:37:58'])
+        parser('20/Feb/2014:11:38:00')
+        parser('20/Feb/2014:11:37:58')
+        parser('21/Feb/2014:11:37:58')
+        self.assertEqual(parser.cache.keys(), [
+            '20/Feb/2014:11:37:58', '21/Feb/2014:11:37:58',
+        ])
+
+    def test_invalid(self):
+        field = slurp.form.Datetime(format='DD/MMM/YYYY:HH:mm:ss')
+        field.convert('20/Feb/2014:11:37:58')
+        for value in ['20/Feb/2014:11:37:61', '20/Feb/2014:99:37:58', '20/Nop/2014']:
+            with self.assertRaises(ValueError):
+                field.convert(value)
@@ -0,0 +1,129 @@
+import datetime
+import decimal
+import json
+from StringIO import StringIO
+
+import dateutil.tz
+
+import slurp
+from slurp.serialize import BACKENDS, DatetimeFormatter, Encoder
+
+from . import TestCase
+
+
+class TestSerialize(TestCase):
+
+    def encoders(self):
+        for name, factory in BACKENDS:
+            try:
+                factory()
+            except ImportError:
+                continue
+            yield Encoder(name)
+
+    def test_values(self):
+        value = {
+            'string': 'a "quoted"\nstring/',
+            'unicode': u'\xe9\u2603',
+            'int': 12,
+            'long': 2 ** 70,
+            'float': 0.622211,
+            'bool': [True, False],
+            'none': None,
+            'nested': {'list': [1, [2, 3]], 'tuple': (4, 5)},
+            'date': datetime.date(2014, 2, 20),
+        }
+        for encoder in self.encoders():
+            self.assertEqual(json.loads(encoder(value)), json.loads(json.dumps(
+                value, default=lambda v: v.isoformat(),
+            )))
+        self.assertEqual(slurp.serialize.dumps({1: 'a'}), '{"1":"a"}')
+        with self.assertRaises(TypeError):
+            slurp.serialize.dumps({'bad': object()})
+        encoder = Encoder(default=repr)
+        self.assertEqual(encoder(Exception('bad')), '"Exception(\'bad\',)"')
+
+    def test_datetime(self):
+        format = DatetimeFormatter()
+        for value in [
+                datetime.datetime(2014, 2, 20, 11, 37, 58),
+                datetime.datetime(2014, 2, 20, 11, 37, 58, 622211),
+                datetime.datetime(2014, 2, 20, 11, 37, 58, tzinfo=dateutil.tz.tzutc()),
+                datetime.datetime(2014, 2, 20, 11, 37, 58, tzinfo=dateutil.tz.tzoffset(None, 19800)),
+                datetime.datetime(2014, 2, 20, 11, 37, 58, tzinfo=dateutil.tz.tzoffset(None, -25200)),
+            ]:
+            self.assertEqual(format(value), '"{0}"'.format(value.isoformat()))
+        # NOTE: equal but differently formatted
+        value = datetime.datetime(2014, 2, 20, 6, 7, 58, tzinfo=dateutil.tz.tzutc())
+        self.assertEqual(format(value), '"2014-02-20T06:07:58+00:00"')
+
+    def test_form(self):
+        form = self.Form({
+            'ip': '127.0.0.1',
+            'timestamp': '20/Feb/2014:11:37:58',
+            'status': '201',
+            'request': {'method': 'POST', 'uri': '/credits'},
+        })
+        form['extra'] = 1
+        encoder = Encoder()
+        self.assertEqual(encoder(form), (
+            '{"ip":"127.0.0.1","timestamp":"2014-02-20T11:37:58+00:00",'
+            '"request":{"method":"POST","uri":"/credits"},"status":201,'
+            '"extra":1}'
+        ))
+        self.assertIn(self.Form, encoder.encoders)
+        self.assertIn(self.Form.request.form_type, encoder.encoders)
+        del form['extra']
+        del form['status']
+        self.assertEqual(
+            json.loads(encoder(slurp.form.to_dict(form))), json.loads(encoder(form)),
+        )
+
+    def test_echo(self):
+        stream = StringIO()
+        sink = slurp.Echo('tk', stream=stream)
+        sink({'at': datetime.datetime(2014, 2, 20, 11, 37, 58)}, None)
+        sink({'i': 1}, None)
+        self.assertEqual(
+            stream.getvalue(), '{"at":"2014-02-20T11:37:58"}\n{"i":1}\n',
+        )
+        stream = StringIO()
+        sink = slurp.Echo('tk', stream=stream)
+        sink({
+            'amount': decimal.Decimal('1.50'),
+            'at': datetime.time(11, 37, 58),
+            'tags': set(['a']),
+            'agent': 'curl\xff',
+        }, None)
+        self.assertDictEqual(json.loads(stream.getvalue()), {
+            'amount': "Decimal('1.50')",
+            'at': 'datetime.time(11, 37, 58)',
+            'tags': "set(['a'])",
+            'agent': u'curl\ufffd',
+        })
+
+    def test_errors(self):
+        for encoder in self.encoders():
+            with self.assertRaises(UnicodeDecodeError):
+                encoder({'a': '\xff'})
+            encoder = Encoder(encoder.backend, errors='replace')
+            self.assertEqual(
+                json.loads(encoder({'\xfe': '\xff', 'b': u'\xe9'})),
+                {u'\ufffd': u'\ufffd', 'b': u'\xe9'},
+            )
+
+    class Form(slurp.Form):
+
+        ip = slurp.form.String()
+
+        timestamp = slurp.form.Datetime(format='DD/MMM/YYYY:HH:mm:ss')
+
+        class Request(slurp.Form):
+
+            method = slurp.form.String()
+
+            uri = slurp.form.String()
+
+        request = slurp.form.SubForm(Request)
+
+        status = slurp.form.Integer(default=None)
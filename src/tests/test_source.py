@@ -1,6 +1,8 @@
+import os
 import re
 
 import slurp
+from slurp.source import literals
 
 from . import TestCase
 
@@ -97,6 +99,63 @@ guru_id=(?:(?P<guru_id>\w+)|-)|
             self.assertEqual(extras, set([]))
             self.assertIsInstance(block, slurp.Block)
 
+    def test_form_compiled(self):
+
+        class Payload(slurp.Form):
+
+            method = slurp.form.String(default=None)
+
+            version = slurp.form.String(default=None).capture(r'(?P<major>\d+)\.', 'major')
+
+            status = slurp.form.Integer(default=None).min(100)
+
+            request_time_secs = slurp.form.Float(default=0).tag('exclude')
+
+            request_time_usecs = slurp.form.Float(default=0).tag('exclude')
+
+            request_time = slurp.form.Float(default=None)
+
+            @request_time.compute
+            def request_time(self):
+                return self.request_time_secs + self.request_time_usecs / 1e6
+
+        class Form(self.Form):
+
+            offset_b = slurp.form.Integer('block.begin').from_context()
+
+            kind = slurp.form.String().constant('access')
+
+            payload = slurp.form.SubForm(Payload, None)
+
+        mapper = slurp.form.compile(Form)
+        self.assertEqual(mapper.fallbacks, [])
+        self.assertEqual(mapper.nested[0][1].fallbacks, ['request_time'])
+        src = slurp.Source('test-source', globs=[], pattern=self.pattern, form=Form)
+        forms = list(src.forms(self.open_fixture('sources', 'access.log')))
+        self.assertEqual(len(forms), 6)
+        for f, block in forms:
+            self.assertIsInstance(f, Form)
+            self.assertIsInstance(f.payload, Payload)
+            self.assertNotIn('request_time_secs', f.payload)
+            self.assertEqual(f.offset_b, block.begin)
+            self.assertEqual(f.payload.version, '1')
+            groups = self.pattern.match(block.raw).groupdict()
+            with slurp.form.ctx(block=block, pattern=None):
+                expected = Form()
+                self.assertEqual(expected(
+                    dict((k, v) for k, v in groups.iteritems() if v is not None)
+                ), [])
+            self.assertEqual(expected.filter('exclude', inv=True), f)
+
+        # errors
+        f, errors = mapper({'ip': '127.0.0.1', 'status': '99'}, block=block)
+        self.assertEqual(errors, ['timestamp', 'status - "99" must be >= 100'])
+        with slurp.form.ctx(block=block):
+            self.assertEqual(
+                [str(error) for error in Form()({'ip': '127.0.0.1', 'status': '99'})],
+                errors,
+            )
+
     def test_filter(self):
         src = slurp.Source(
             'test-source',
@@ -111,6 +170,68 @@ guru_id=(?:(?P<guru_id>\w+)|-)|
         )
 
 
+    def test_filter_fields(self):
+        seen = []
+
+        def filter(form, block):
+            seen.append(dict(form))
+            return form.get('method') == 'GET'
+
+        src = slurp.Source(
+            'test-source',
+            globs=[],
+            pattern=self.pattern,
+            form=self.Form,
+            filter=filter,
+            filter_fields=['method', 'nope'],
+        )
+        self.assertEqual(src.patterns[0].groups, [
+            'ip', 'user', 'timestamp', 'method', 'uri', 'version', 'status',
+            'bytes',
+        ])
+        forms = list(src.forms(self.open_fixture('sources', 'access.log')))
+        self.assertEqual(len(seen), 6)
+        self.assertTrue(all(s.keys() == ['method'] for s in seen))
+        self.assertEqual(len(forms), 3)
+        self.assertEqual(
+            [f.method for f, _ in forms],
+            [s['method'] for s in seen if s['method'] == 'GET'],
+        )
+        self.assertTrue(all(isinstance(f, self.Form) for f, _ in forms))
+
+    def test_raw_filter(self):
+        for kwargs, methods, rejects in [
+                (dict(raw_exclude=['"GET /debits']), ['POST', 'POST', 'POST', 'GET'], 2),
+                (dict(raw_include=['"GET ', r'/credits\s']), ['POST', 'GET', 'GET', 'GET'], 2),
+                (dict(raw_filter=lambda block: block.begin == 0), ['POST'], 5),
+            ]:
+            src = slurp.Source(
+                'test-source',
+                globs=[],
+                pattern=self.pattern,
+                form=self.Form,
+                strict=True,
+                **kwargs
+            )
+            forms = list(src.forms(self.open_fixture('sources', 'access.log')))
+            self.assertEqual([f.method for f, _ in forms], methods)
+            self.assertEqual(src.raw_rejects, rejects)
+
+    def test_raw_filter_file(self):
+        src = slurp.Source(
+            'test-source',
+            globs=[],
+            pattern=r'GET (?P<p>\S+)',
+            raw_filter=lambda block: 'GET /health' not in block.raw,
+        )
+        path = self.tmp_file()
+        with open(path, 'w') as fo:
+            fo.write('GET /health\nGET /x\n')
+        with open(path, 'r') as fo:
+            forms = list(src.forms(fo))
+        self.assertEqual([f['p'] for f, _ in forms], ['/x'])
+        self.assertEqual(src.raw_rejects, 1)
+
     def test_error_lax(self):
         src = slurp.Source(
             'test-source',
@@ -155,3 +276,211 @@ a.b.c.d - - [20/Feb/2014:11:37:58] "POST /credits/CR3sPVGSAkPYA9vp1lshEMv4/rever
         self.assertListEqual([
             (0, 341)
         ], blocks)
+
+    def test_batches(self):
+        src = slurp.Source(
+            'test-source',
+            globs=[],
+            pattern=self.pattern,
+            form=self.Form,
+        )
+        expected = list(src.forms(self.open_fixture('sources', 'access.log')))
+        batches = list(src.batches(self.open_fixture('sources', 'access.log'), max_blocks=4))
+        self.assertListEqual([4, 2], map(len, batches))
+        self.assertListEqual(expected, [f for forms in batches for f in forms])
+
+    def test_anchored_pattern(self):
+        src = slurp.Source(
+            'test-source',
+            globs=[],
+            pattern=r'^(?P<a>\w+) (?P<b>\w+)$',
+        )
+        raw = 'aa bb\ncc dd\nee ff\n'
+        path = self.tmp_file()
+        with open(path, 'w') as fo:
+            fo.write(raw)
+        for fo in [self.io_fixture(raw), open(path, 'r')]:
+            self.assertListEqual(
+                [('aa', 'bb'), ('cc', 'dd'), ('ee', 'ff')],
+                [(f['a'], f['b']) for f, _ in src.forms(fo)],
+            )
+
+    def test_parallel_batches(self):
+        src = slurp.Source(
+            'test-source',
+            globs=[],
+            pattern=self.pattern,
+            form=self.Form,
+        )
+        expected = [
+            (dict(f), block.begin, block.end, str(block.raw))
+            for f, block in src.forms(self.open_fixture('sources', 'access.log'))
+        ]
+        with self.open_fixture('sources', 'access.log') as fo:
+            fo.seek(309)
+            batches = list(src.parallel_batches(fo, jobs=2, chunk_size=500))
+            self.assertEqual(fo.tell(), 1950)
+        self.assertGreater(len(batches), 1)
+        self.assertListEqual(expected[1:], [
+            (f, block.begin, block.end, block.raw)
+            for forms in batches for f, block in forms
+        ])
+        # NOTE: pool processes do not update the index
+        src.index_interval, src.state_dir = 1, self.tmp_dir()
+        with self.open_fixture('sources', 'access.log') as fo:
+            list(src.parallel_batches(fo, jobs=2, chunk_size=500))
+            self.assertEqual(len(src.index(fo)), 0)
+
+    def test_index(self):
+        src = slurp.Source(
+            'test-source',
+            globs=[],
+            pattern=self.pattern,
+            form=self.Form,
+            timestamp='timestamp',
+            index_interval=2,
+            state_dir=self.tmp_dir(),
+        )
+        with self.open_fixture('sources', 'access.log') as fo:
+            blocks = [block for _, block in src.forms(fo)]
+        index = src.index(self.open_fixture('sources', 'access.log'))
+        self.assertListEqual(
+            [blocks[i].begin for i in xrange(0, len(blocks), 2)],
+            list(index.offsets),
+        )
+        self.assertEqual(index.timestamps[0], 1392896277.0)
+        with self.open_fixture('sources', 'access.log') as fo:
+            self.assertEqual(src.align(fo, blocks[3].begin + 1), blocks[4].begin)
+            self.assertEqual(fo.tell(), blocks[4].begin)
+            self.assertEqual(src.align(fo, blocks[2].begin), blocks[2].begin)
+            f, block = next(src.forms(fo))
+            self.assertEqual(block, blocks[2])
+        with self.open_fixture('sources', 'access.log') as fo:
+            list(src.forms(fo))
+        self.assertListEqual(
+            list(index.offsets),
+            list(src.index(self.open_fixture('sources', 'access.log')).offsets),
+        )
+        # NOTE: cached until the index file changes
+        fo = self.open_fixture('sources', 'access.log')
+        self.assertIs(src.index(fo), index)
+        with open(index.index_path, 'a') as ifo:
+            ifo.write('{0} -\n'.format(blocks[5].begin))
+        self.assertIsNot(src.index(fo), index)
+        self.assertEqual(src.index(fo).offsets[-1], blocks[5].begin)
+
+    def test_index_writers(self):
+        path = self.fixture('sources', 'access.log')
+        index_path = os.path.join(self.tmp_dir(), 'index')
+        with open(path, 'r') as fo:
+            batch = next(slurp.Blocks(fo).batches())
+        offsets = list(batch.begins)
+        writer = slurp.BlockIndex(path, index_path, interval=2)
+        writer.update(batch)
+        self.assertListEqual(offsets[::2], list(writer.offsets))
+        # NOTE: only one index appends to the file at a time
+        other = slurp.BlockIndex(path, index_path, interval=1)
+        other.update(batch)
+        self.assertListEqual(offsets[::2] + offsets[5:], list(other.offsets))
+        other.close()
+        writer.close()
+        self.assertListEqual(
+            offsets[::2], list(slurp.BlockIndex(path, index_path).offsets),
+        )
+        # NOTE: offsets that do not increase are discarded
+        with open(index_path, 'a') as fo:
+            fo.write('{0} -\n{1} -\n'.format(offsets[1], offsets[5]))
+        self.assertListEqual(
+            offsets[::2] + offsets[5:],
+            list(slurp.BlockIndex(path, index_path).offsets),
+        )
+
+    def test_search(self):
+        lines = ['{0} request {1}\n'.format(1000 + i // 3, i) for i in xrange(3000)]
+        lines[1500] = 'garbage\n'
+        path = self.tmp_file()
+        with open(path, 'w') as fo:
+            fo.write(''.join(lines))
+
+        class Form(slurp.Form):
+
+            timestamp = slurp.form.Integer()
+
+        src = slurp.Source(
+            'test-source',
+            globs=[],
+            pattern=r'(?P<timestamp>\d+) (?P<message>.+)',
+            form=Form,
+            timestamp='timestamp',
+        )
+        with open(path, 'r') as fo:
+            for ts in [1000, 1001, 1500, 1501, 1999]:
+                index = 1 + max([-1] + [
+                    i for i, line in enumerate(lines)
+                    if line[0].isdigit() and int(line.split()[0]) < ts
+                ])
+                offset = sum(len(line) for line in lines[:index])
+                self.assertEqual(src.search(fo, ts), offset)
+                self.assertEqual(fo.tell(), offset)
+            self.assertEqual(src.search(fo, 0), 0)
+            self.assertEqual(src.search(fo, 3000), os.path.getsize(path))
+
+    def test_prefilter(self):
+        raw = ''.join(
+            line + 'kernel: eth0 link up\n'
+            for line in self.read_fixture('sources', 'access.log').splitlines(True)
+        )
+        src = slurp.Source(
+            'test-source',
+            globs=[],
+            pattern=self.pattern,
+            form=self.Form,
+        )
+        self.assertEqual(['.', '-', '['], literals(self.pattern))
+        forms = list(src.forms(self.io_fixture(raw)))
+        self.assertEqual(len(forms), 6)
+        self.assertEqual(src.prefilter_rejects, 6)
+
+        src = slurp.Source(
+            'test-source',
+            globs=[],
+            pattern=self.pattern,
+            form=self.Form,
+            prefilter=['POST /credits/'],
+        )
+        forms = list(src.forms(self.io_fixture(raw)))
+        self.assertEqual(len(forms), 1)
+        self.assertEqual(src.prefilter_rejects, 11)
+
+        src = slurp.Source(
+            'test-source',
+            globs=[],
+            pattern=self.pattern,
+            form=self.Form,
+            prefilter=[],
+        )
+        forms = list(src.forms(self.io_fixture(raw)))
+        self.assertEqual(len(forms), 6)
+        self.assertEqual(src.prefilter_rejects, 0)
+
+    def test_patterns(self):
+        src = slurp.Source(
+            'test-source',
+            globs=[],
+            patterns={
+                'health': r'.+?"GET /health',
+                'access': self.pattern,
+            },
+        )
+        src.reorder_interval = 2
+        self.assertEqual(['access', 'health'], [p.name for p in src.patterns])
+        raw = ''.join(
+            line.replace('POST /bank_accounts ', 'GET /health ')
+            for line in self.read_fixture('sources', 'access.log').splitlines(True)
+        )
+        src.patterns.reverse()
+        forms = list(src.forms(self.io_fixture(raw)))
+        self.assertEqual(len(forms), 6)
+        self.assertEqual(['access', 'health'], [p.name for p in src.patterns])
+        with self.assertRaises(ValueError):
+            slurp.Source('test-source', globs=[])